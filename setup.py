@@ -49,8 +49,11 @@ setup(
         "License :: OSI Approved :: BSD License",
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
-        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
     ],
+    # Module-level __getattr__ (PEP 562) and __mro_entries__ (PEP 560) are used to import plugin types lazily
+    python_requires=">=3.7",
     # What does your project relate to?
     keywords="synchrotron analysis x-ray scattering tomography ",
     # You can just specify the packages manually here if your project is
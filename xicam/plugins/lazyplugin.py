@@ -0,0 +1,155 @@
+import threading
+from collections.abc import Mapping
+from typing import Callable, Dict
+
+import entrypoints
+
+
+class LazyPluginProxy(object):
+    """
+    Stands in for a plugin class whose module has not been imported yet.
+
+    Cheap metadata (the entrypoint name, the plugin's type, and the object's ``__name__`` and ``__module__``) is
+    available without importing anything. The real class is resolved through ``entrypoint.load()`` the first time the
+    proxy is called, subclassed, used in an isinstance check, or has any other attribute read (including ``__doc__``).
+
+    Only suitable for non-singleton plugin types; singletons are instantiated at collection time anyway.
+
+    `load(type_name, entrypoint)` imports the class (defaults to ``entrypoint.load()``), and `on_load` is called with
+    the proxy and the class once it has been imported.
+
+    Notes
+    -----
+    ``issubclass(proxy, SomeClass)`` does not work, since the proxy is not itself a class; use ``proxy.load()`` first.
+    """
+
+    def __init__(self, type_name: str, entrypoint: entrypoints.EntryPoint, is_singleton: bool = False,
+                 load: Callable = None, on_load: Callable = None):
+        # Use object.__setattr__ in case a subclass reroutes attribute access
+        object.__setattr__(self, 'type_name', type_name)
+        object.__setattr__(self, 'entrypoint', entrypoint)
+        object.__setattr__(self, 'is_singleton', is_singleton)
+        object.__setattr__(self, '_load', load or (lambda type_name, entrypoint: entrypoint.load()))
+        object.__setattr__(self, '_on_load', on_load)
+        object.__setattr__(self, '_plugin_class', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def name(self):
+        return self.entrypoint.name
+
+    @property
+    def module_name(self):
+        return self.entrypoint.module_name
+
+    @property
+    def __name__(self):
+        return (self.entrypoint.object_name or self.entrypoint.module_name).split('.')[-1]
+
+    def __getattribute__(self, attr):
+        # A class's own __module__ and __doc__ live in its namespace (where a property would replace them on the class
+        # itself), so proxies resolve theirs here
+        if attr == '__module__':
+            return object.__getattribute__(self, 'entrypoint').module_name
+        if attr == '__doc__':
+            return object.__getattribute__(self, 'load')().__doc__
+        return object.__getattribute__(self, attr)
+
+    @property
+    def loaded(self) -> bool:
+        return self._plugin_class is not None
+
+    def load(self):
+        """
+        Import (if needed) and return the real plugin class.
+        """
+        if self._plugin_class is None:
+            with self._lock:
+                if self._plugin_class is None:
+                    plugin_class = self._load(self.type_name, self.entrypoint)
+                    object.__setattr__(self, '_plugin_class', plugin_class)
+                    if self._on_load:
+                        self._on_load(self, plugin_class)
+        return self._plugin_class
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        # Only called for attributes not found on the proxy itself
+        if attr.startswith('__') and attr.endswith('__') and attr != '__qualname__':
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def __mro_entries__(self, bases):
+        # Allows `class MyPlugin(proxy): ...`
+        return (self.load(),)
+
+    def __instancecheck__(self, instance):
+        return isinstance(instance, self.load())
+
+    def __subclasscheck__(self, subclass):
+        return issubclass(subclass, self.load())
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<LazyPluginProxy {self.type_name}:{self.name} ({state})>'
+
+
+class LazyPluginTypes(Mapping):
+    """
+    Plugin type classes by name, registered from their entrypoints without importing them.
+
+    A type's class is imported the first time it is looked up (i.e. ``plugin_types['ProcessingPlugin']``); iterating,
+    ``len``, and ``in`` only consult the registered names. `load(type_name, entrypoint)` imports a type, returning None
+    if the type can't be used here, in which case it's dropped (and looking it up raises KeyError). `on_load` is called
+    with each type's name and class once it's been imported.
+    """
+
+    def __init__(self, type_entrypoints: Dict[str, entrypoints.EntryPoint], load: Callable = None,
+                 on_load: Callable = None):
+        self._entrypoints = dict(type_entrypoints)
+        self._load = load or (lambda type_name, entrypoint: entrypoint.load())
+        self._on_load = on_load
+        self._classes = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, type_name):
+        type_class = self._classes.get(type_name)
+        if type_class is not None:
+            return type_class
+        with self._lock:
+            if type_name not in self._classes:
+                type_class = self._load(type_name, self._entrypoints[type_name])
+                if type_class is None:
+                    del self._entrypoints[type_name]
+                    raise KeyError(type_name)
+                self._classes[type_name] = type_class
+                if self._on_load:
+                    self._on_load(type_name, type_class)
+            return self._classes[type_name]
+
+    def register(self, type_entrypoints: Dict[str, entrypoints.EntryPoint]) -> list:
+        """ Register any types not already known (i.e. from a newly installed package); returns their names."""
+        with self._lock:
+            new_types = [type_name for type_name in type_entrypoints
+                         if type_name not in self._entrypoints and type_name not in self._classes]
+            for type_name in new_types:
+                self._entrypoints[type_name] = type_entrypoints[type_name]
+        return new_types
+
+    def __contains__(self, type_name):
+        return type_name in self._entrypoints
+
+    def __iter__(self):
+        return iter(list(self._entrypoints))
+
+    def __len__(self):
+        return len(self._entrypoints)
+
+    def loaded_types(self) -> dict:
+        """ The type classes imported so far, by name."""
+        return dict(self._classes)
+
+    def __repr__(self):
+        return f'<LazyPluginTypes {len(self._classes)} of {len(self)} loaded>'
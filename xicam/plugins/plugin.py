@@ -1,2 +1,3 @@
 class PluginType():
     is_singleton = False
+    needs_qt = True  # types usable without a Qt GUI (i.e. headless) set this False
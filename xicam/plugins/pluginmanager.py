@@ -0,0 +1,1483 @@
+import sys
+import os
+import platform
+import itertools
+import warnings
+import importlib.abc
+import importlib.util
+import hashlib
+import types
+import threading
+from queue import Empty
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from enum import Enum, auto
+from contextlib import contextmanager
+from timeit import default_timer
+from typing import List
+
+import entrypoints
+from appdirs import user_config_dir, site_config_dir, user_cache_dir
+
+from xicam.core import msg
+from xicam.core.args import parse_args
+
+from .startupcache import EntrypointIndex, FailureCache, ProbeCache
+from .lazyplugin import LazyPluginProxy, LazyPluginTypes
+from .startuptrace import StartupTrace, StartupReport
+from .pluginscheduler import PluginScheduler
+from .pluginregistry import PluginRegistry
+from .pluginmetadata import PluginMetadata
+from .probe import probe_entrypoint, ProbeResult
+
+# A shared, persistent index of all xicam.plugins entrypoints
+entrypoint_index = EntrypointIndex()
+
+# Managers observing venv changes; set once cammart's venvs are imported (see venv_observers)
+venvsobservers = None
+
+op_sys = platform.system()
+if op_sys == "Darwin":  # User config dir incompatible with venv on darwin (space in path name conflicts)
+    user_plugin_dir = os.path.join(user_cache_dir(appname="xicam"), "plugins")
+else:
+    user_plugin_dir = os.path.join(user_config_dir(appname="xicam"), "plugins")
+site_plugin_dir = os.path.join(site_config_dir(appname="xicam"), "plugins")
+
+# Top-level packages that provide Qt bindings
+QT_MODULES = ('qtpy', 'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'sip', 'shiboken2', 'shiboken6', 'pyqtgraph')
+
+
+class _QtImportBlocker(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split('.')[0] in QT_MODULES:
+            raise ImportError(f'{fullname} is not available to headless plugin collection', name=fullname)
+        return None
+
+
+@contextmanager
+def qt_imports_blocked():
+    """
+    Make importing any Qt binding (that isn't already imported) raise ImportError within this context. Note that this
+    applies to all threads while active.
+    """
+    blocker = _QtImportBlocker()
+    sys.meta_path.insert(0, blocker)
+    try:
+        yield
+    finally:
+        sys.meta_path.remove(blocker)
+
+
+def qt_app_running() -> bool:
+    """
+    Whether a QApplication is running in this process. Qt isn't imported to find out: an application can only exist once
+    a Qt binding has been imported, so if none is loaded (or qtpy can't be imported), there's none.
+    """
+    if not any(name in sys.modules for name in ('qtpy', 'PyQt5', 'PyQt6', 'PySide2', 'PySide6')):
+        return False
+    try:
+        from qtpy.QtWidgets import QApplication
+    except Exception:
+        return False
+    return QApplication.instance() is not None
+
+
+def venv_observers(index: EntrypointIndex = None):
+    """
+    Find cammart's list of venv observers (importing it), if cammart is installed and allowed. cammart is a Qt GUI, so
+    it's only imported once a QApplication is running (see `qt_app_running`); returns None otherwise.
+    """
+    global venvsobservers
+    if venvsobservers is None and qt_app_running() and '--no-cammart' not in sys.argv and \
+            'cammart' in (index or entrypoint_index).get_group_named('xicam.plugins.SettingsPlugin'):
+        try:
+            from xicam.gui.cammart.venvs import observers as venvsobservers
+            from xicam.gui.cammart import venvs
+        except ImportError:
+            pass
+    return venvsobservers
+
+
+@contextmanager
+def load_timer():
+    start = default_timer()
+    elapser = lambda: default_timer() - start
+    yield lambda: elapser()
+    end = default_timer()
+    elapser = lambda: end - start
+
+
+class State(Enum):
+    READY = auto()
+    DISCOVERING = auto()
+    LOADING = auto()
+    INSTANTIATING = auto()
+
+
+class Filters(Enum):
+    UPDATE = auto()
+    COMPLETE = auto()
+
+
+class PluginChanges(object):
+    """
+    Describes which plugins were added, replaced, or removed, as ``{type_name: [plugin names]}`` mappings.
+
+    Sent to observers attached with ``with_changes=True``; see `XicamPluginManager.attach`.
+
+    Recording several changes to the same plugin keeps only the net change; i.e. a plugin that is added and then
+    replaced is still just added, and one that is removed and then added again is replaced.
+    """
+
+    def __init__(self, added=None, replaced=None, removed=None):
+        self.added = added or {}
+        self.replaced = replaced or {}
+        self.removed = removed or {}
+
+    @staticmethod
+    def _discard(changes, type_name, name):
+        names = changes.get(type_name, [])
+        if name not in names:
+            return False
+        names.remove(name)
+        if not names:
+            del changes[type_name]
+        return True
+
+    @staticmethod
+    def _record(changes, type_name, name):
+        names = changes.setdefault(type_name, [])
+        if name not in names:
+            names.append(name)
+
+    def add(self, type_name, name):
+        if self._discard(self.removed, type_name, name):
+            self._record(self.replaced, type_name, name)
+        else:
+            self._record(self.added, type_name, name)
+
+    def replace(self, type_name, name):
+        if name not in self.added.get(type_name, []):
+            self._record(self.replaced, type_name, name)
+
+    def remove(self, type_name, name):
+        if not self._discard(self.added, type_name, name):
+            self._discard(self.replaced, type_name, name)
+            self._record(self.removed, type_name, name)
+
+    def merge(self, other: 'PluginChanges'):
+        """ Fold the (later) changes in `other` into these."""
+        for record, changes in ((self.remove, other.removed), (self.add, other.added), (self.replace, other.replaced)):
+            for type_name, names in changes.items():
+                for name in names:
+                    record(type_name, name)
+        return self
+
+    def __bool__(self):
+        return bool(self.added or self.replaced or self.removed)
+
+    def __repr__(self):
+        return f'PluginChanges(added={self.added!r}, replaced={self.replaced!r}, removed={self.removed!r})'
+
+
+class XicamPluginManager():
+
+    def __init__(self, index: EntrypointIndex = None, lazy_types=(), load_workers: int = 1,
+                 type_priorities: dict = None, plugin_priorities: dict = None, instantiate_budget: float = 0.008,
+                 headless: bool = None, notify_interval: float = 0.1, retry_failed: bool = False,
+                 track_memory: bool = False, probe: bool = False, probe_timeout: float = 30,
+                 probe_workers: int = None):
+        """
+        Parameters
+        ----------
+        index : EntrypointIndex
+            the entrypoint index to discover plugins from (defaults to the shared, persistent index)
+        lazy_types : Iterable[str]
+            names of non-singleton plugin types (i.e. 'ProcessingPlugin') whose plugins are registered as
+            `LazyPluginProxy` objects, so that their modules are only imported on first use
+        load_workers : int
+            number of threads used to import entrypoints concurrently; entrypoints sharing a top-level package are
+            always imported one after another. The default (1) imports everything serially.
+        type_priorities : dict
+            maps plugin type names to priorities; plugins of higher priority types are loaded and instantiated
+            first. Defaults to each type class's `priority` attribute (or 0).
+        plugin_priorities : dict
+            maps plugin names to priorities (i.e. to bring up a default GUIPlugin first); these take precedence over
+            type priorities
+        instantiate_budget : float
+            seconds of each event loop tick that may be spent instantiating queued plugins, before returning control
+            to the event loop. At least one plugin is instantiated per tick; 0 instantiates exactly one.
+        headless : bool
+            collect plugins without Qt (i.e. on a compute node or in a script). Only plugin types that declare
+            ``needs_qt = False`` are collected; types whose modules can't be imported without Qt are skipped, and no Qt
+            module is imported by the manager. `collect_plugins` then loads (with `load_workers` threads) and
+            instantiates every plugin before returning, rather than handing off to the Qt event loop. Defaults to
+            True when no QApplication is running when the manager is created (see `qt_app_running`).
+        notify_interval : float
+            seconds over which `Filters.UPDATE` notifications are coalesced into a single `PluginChanges` for
+            observers attached with ``coalesce=True`` (the default); see `attach`
+        retry_failed : bool
+            entrypoints that failed to load on an earlier launch are skipped (with a notice) until their module, the
+            files involved in the failed import, or the installed distributions change; if `retry_failed`, they are all
+            retried instead. See `retry_failed_plugins`.
+        track_memory : bool
+            measure the memory allocated (with tracemalloc) and the resident memory gained while importing and
+            instantiating each plugin; see `StartupReport.plugin_memory`. This slows collection down noticeably.
+        probe : bool
+            import each new or changed entrypoint in a short-lived subprocess first (see `probe.probe_entrypoint`), so
+            that an import that hangs or crashes can't take Xi-cam down; only entrypoints that imported successfully
+            there are imported in-process. Results are cached (see `ProbeCache`), so unchanged entrypoints aren't
+            probed again; failures are cached as for any failed import.
+        probe_timeout : float
+            seconds a probe may take before it's killed (and the entrypoint considered broken)
+        probe_workers : int
+            number of probes to run at once (defaults to the CPU count)
+        """
+
+        self._index = index or entrypoint_index
+        self.headless = not qt_app_running() if headless is None else headless
+        self._failures = FailureCache(self._index)
+        self._probes = ProbeCache(self._index)
+        self.probe = probe
+        self.probe_timeout = probe_timeout
+        self.probe_workers = probe_workers
+        if retry_failed:
+            self._failures.forget()
+        self.lazy_types = set(lazy_types)
+        self.load_workers = load_workers
+        self.plugin_priorities = dict(plugin_priorities or {})
+        self.instantiate_budget = instantiate_budget
+        self._pump_scheduled = False
+        self._pump_lock = threading.Lock()
+        self._configured_type_priorities = dict(type_priorities or {})
+        self.type_priorities = {}
+
+        # Plugins (and their types) that have been requested before being collected jump the queue;
+        # the most recent request ranks highest
+        self._promoted_plugins = {}
+        self._promoted_types = {}
+        self._promotion_counter = itertools.count(1)
+        self.trace = StartupTrace(track_memory=track_memory)
+
+        # UPDATE notifications waiting to be sent to coalescing observers, and when the first of them arrived
+        self.notify_interval = notify_interval
+        self._coalesced_changes = PluginChanges()
+        self._coalesce_started = None
+        self._coalesce_lock = threading.Lock()
+        # Plugins being collected in place of one that was collected before (see collect_plugin's `replace`)
+        self._replacing = set()
+        # Whether entrypoints changed during a collection; they're collected again once it completes
+        self._recollect = False
+        self._collect_lock = threading.RLock()
+
+        # Futures for plugins that callers are waiting on, keyed by (type_name, name); see get_plugin_by_name
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._load_errors = {}
+        self._source_fingerprints = {}
+        self._source_hashes = {}  # path: ((mtime, size), sha1) of files hashed by _changed_modules
+        self._blacklist = []
+        self._load_queue = PluginScheduler(self._priority)
+        self._instantiate_queue = PluginScheduler(self._priority)
+        self._observers = []
+        self.state = State.READY
+        self.plugin_types = {}
+
+        # Discovered entrypoints, imported plugin classes (or proxies), and collected plugins, by type and name. These
+        # are written during collection while other threads look plugins up; see PluginRegistry
+        self._entrypoints = PluginRegistry()
+        self._load_cache = PluginRegistry()
+        self._plugins = PluginRegistry()
+
+        # Remember all modules loaded before any plugins are loaded; don't bother unloading these
+        self._preloaded_modules = set(sys.modules.keys())
+
+        # Observe changes to venvs
+        observers = venv_observers(self._index)
+        if observers is not None:
+            observers.append(self)
+
+        # Register plugin types by name; a type's class is only imported once a plugin of that type is discovered or
+        # registered (or the type is looked up in `plugin_types`)
+        self.plugin_types = LazyPluginTypes({}, load=self._load_type, on_load=self._type_loaded)
+        self.type_priorities = dict(self._configured_type_priorities)
+        self._register_types()
+
+        # Check if cammart should be ignored
+        try:
+            args = parse_args(exit_on_fail=False)
+            include_cammart = not args.nocammart
+            self._blacklist = args.blacklist
+        except RuntimeError:
+            include_cammart = False
+
+        # ...if so, blacklist it
+        if not include_cammart:
+            self._blacklist.extend(['cammart', 'venvs'])
+
+    def _register_types(self):
+        type_entrypoints = self._index.get_group_named('xicam.plugins.PluginType')
+        new_types = self.plugin_types.register(type_entrypoints)
+        # Initialize types
+        for registry in (self._entrypoints, self._load_cache, self._plugins):
+            registry.add_types(new_types)
+
+    @property
+    def type_mapping(self) -> PluginRegistry:
+        """
+        Collected plugins by type and name; ``type_mapping[type_name]`` is a read-only snapshot that's safe to iterate
+        while plugins are being collected.
+        """
+        return self._plugins
+
+    def _load_type(self, type_name, entrypoint):
+        if not self.headless:
+            try:
+                return entrypoint.load()
+            except Exception as ex:
+                msg.logMessage(f'Unable to load the {type_name} plugin type', level=msg.ERROR)
+                msg.logError(ex)
+                return None
+
+        # Toss plugin types that need qt; a type whose module imports Qt needs it, whatever it declares
+        with qt_imports_blocked():
+            try:
+                type_class = entrypoint.load()
+            except ImportError as ex:
+                msg.logMessage(f'Skipping the {type_name} plugin type while headless: {ex}', level=msg.DEBUG)
+                return None
+        if getattr(type_class, 'needs_qt', True):
+            msg.logMessage(f'Skipping the {type_name} plugin type while headless; it needs Qt', level=msg.DEBUG)
+            return None
+        return type_class
+
+    def _type_loaded(self, type_name, type_class):
+        msg.logMessage(f'Loaded the {type_name} plugin type', level=msg.DEBUG)
+        self.type_priorities.setdefault(type_name, getattr(type_class, 'priority', 0))
+
+    def _has_type(self, type_name) -> bool:
+        # Imports the type (if it hasn't been yet); False if it's unknown or can't be used here
+        try:
+            self.plugin_types[type_name]
+        except KeyError:
+            return False
+        return True
+
+    def collect_plugins(self):
+        """
+        Find, load, and instantiate all Xi-cam plugins matching known plugin types
+
+        When `headless`, all plugins are collected by the time this returns.
+        """
+        self._discover_plugins()
+        self._load_plugins()
+
+    def collect_plugin(self, plugin_name, plugin_class, type_name, replace=False):
+        """
+        Register a class as a plugin. For in-memory usage. If `replace`, then any earlier instances are purged first
+
+        """
+        if replace:
+            # Clear cache by name; observers are told the plugin was replaced once the new one is collected
+            if self._plugins.lookup(type_name, plugin_name) is not None:
+                self._replacing.add((type_name, plugin_name))
+            self._forget_entrypoint(type_name, plugin_name)
+            self._forget_plugin(type_name, plugin_name)
+            self._load_cache.pop(type_name, plugin_name)
+        else:
+            try:
+                assert self._plugins.lookup(type_name, plugin_name) is None
+            except AssertionError:
+                raise ValueError(
+                    f'A plugin named {plugin_name} has already been loaded. Supply `replace=True` to override.')
+
+        if not self._has_type(type_name):
+            raise ValueError(f'{type_name} is not an available plugin type.')
+
+        # Start a special collection cycle
+        self.state = State.DISCOVERING
+        live_entry_point = LiveEntryPoint(plugin_name, plugin_class)
+        self._register_entrypoint(type_name, plugin_name, live_entry_point)
+        self._queue_load(type_name, live_entry_point)
+        if self.state == State.DISCOVERING:
+            self.state = State.LOADING
+        self._load_plugins()
+
+    def _unload_plugins(self):
+        assert self.state == State.READY
+        self._load_queue = PluginScheduler(self._priority)
+        self._instantiate_queue = PluginScheduler(self._priority)
+        self._load_errors = {}
+        self._source_fingerprints = {}
+        self._source_hashes = {}
+
+        # Initialize types
+        for registry in (self._entrypoints, self._load_cache, self._plugins):
+            registry.clear()
+        self._promoted_plugins = {}
+        self._promoted_types = {}
+        self._replacing = set()
+
+        reload_candidates = list(filter(lambda key: key.startswith('xicam.'), sys.modules.keys()))
+        for module_name in reload_candidates:
+            # xicam.plugins' own modules may be imported lazily after the manager starts; never unload them
+            if module_name.startswith(f'{__package__}.'):
+                continue
+            if module_name not in self._preloaded_modules:
+                del (sys.modules[module_name])
+
+    def unload_plugin(self, name, type_name) -> List[str]:
+        """
+        Remove a single plugin, so that the memory it holds can be reclaimed without restarting.
+
+        The plugin (and its singleton instance) is dropped from the manager, and any modules that were imported only
+        for it (i.e. not shared with another loaded plugin) are removed from `sys.modules`. The plugin is discovered
+        again on the next `collect_plugins`. Observers are sent a `PluginChanges` with the plugin removed.
+
+        Note that anything else still holding a reference to the plugin (or objects from its modules) keeps that
+        memory alive.
+
+        Returns
+        -------
+        List[str]
+            names of the modules that were unloaded
+
+        Raises
+        ------
+        RuntimeError
+            if plugins are still being collected
+        """
+        if self.state != State.READY:
+            raise RuntimeError(f'The {name} plugin can only be unloaded once plugin collection has completed.')
+        if self._entrypoints.lookup(type_name, name) is None:
+            raise NameError(f'The plugin named {name} of type {type_name} has not been collected.')
+
+        with self._pending_lock:
+            self._pending.pop((type_name, name), None)
+        private_modules = self._retire_plugins([(type_name, name)])
+
+        msg.logMessage(f'Unloaded {name} plugin', *private_modules, sep='\n')
+        self._notify(Filters.UPDATE, PluginChanges(removed={type_name: [name]}))
+        return private_modules
+
+    def _retire_plugins(self, retired) -> List[str]:
+        # Drop the (type_name, name) plugins in `retired`, and the modules only they use; returns the unloaded modules
+        retired = set(retired)
+        plugin_modules, kept_modules = set(), set()
+        for type_name, entrypoints_of_type in self._entrypoints.items():
+            for name, entrypoint in entrypoints_of_type.items():
+                modules = self._plugin_modules(type_name, name, entrypoint)
+                (plugin_modules if (type_name, name) in retired else kept_modules).update(modules)
+
+        # Modules reachable only from these plugins' modules are private to them
+        tracked = set(self._tracked_modules())
+        private_modules = self._referenced_closure(plugin_modules & tracked, tracked) - \
+                          self._referenced_closure(kept_modules & tracked, tracked)
+
+        for type_name, name in retired:
+            self._forget_plugin(type_name, name)
+            self._forget_entrypoint(type_name, name)
+            self._load_cache.pop(type_name, name)
+            self._load_errors.pop((type_name, name), None)
+            self._promoted_plugins.pop((type_name, name), None)
+            self._replacing.discard((type_name, name))
+
+        for module_name in private_modules:
+            sys.modules.pop(module_name, None)
+            self._source_fingerprints.pop(module_name, None)
+            # Unbind it from its parent package too, or the parent keeps it alive
+            parent_name, _, child_name = module_name.rpartition('.')
+            parent = sys.modules.get(parent_name)
+            if parent is not None and isinstance(getattr(parent, child_name, None), types.ModuleType):
+                delattr(parent, child_name)
+
+        return sorted(private_modules)
+
+    def _plugin_modules(self, type_name, name, entrypoint):
+        # The modules a collected plugin was imported from (none for plugins that were never imported)
+        plugin = self._load_cache.lookup(type_name, name)
+        if plugin is None or isinstance(entrypoint, LiveEntryPoint):
+            return set()
+        if isinstance(plugin, LazyPluginProxy) and not plugin.loaded:
+            return set()
+        return {entrypoint.module_name, getattr(plugin, '__module__', entrypoint.module_name)}
+
+    def _referenced_closure(self, module_names, candidates):
+        # Every candidate module reachable from module_names by reference, including their parent packages
+        closure = set()
+        frontier = list(module_names)
+        while frontier:
+            module_name = frontier.pop()
+            if module_name in closure:
+                continue
+            closure.add(module_name)
+            module = sys.modules.get(module_name)
+            references = self._module_references(module, submodules=False) if module is not None else set()
+            references.add(module_name.rpartition('.')[0])
+            frontier.extend(reference for reference in references if reference in candidates)
+        return closure
+
+    def hot_reload(self, incremental=False):
+        """
+        Reload plugins from source.
+
+        By default, every plugin module is unloaded and all plugins are re-collected. If `incremental`, only modules
+        whose source changed since collection (and the modules that depend on them) are reloaded, and only the
+        affected plugins are replaced; the returned `PluginChanges` lists them, and is also sent to observers attached
+        with ``with_changes=True``.
+        """
+        warnings.warn('Hot-reloading plugins; unexpected and unpredictable behavior may occur...', UserWarning)
+        if incremental:
+            return self._reload_changed()
+        self._unload_plugins()
+        self.collect_plugins()
+
+    def _tracked_modules(self):
+        # Modules belonging to the packages that provide plugins; these are the only candidates for reloading
+        prefixes = set()
+        for entrypoints_of_type in self._entrypoints.values():
+            for entrypoint in entrypoints_of_type.values():
+                if not isinstance(entrypoint, LiveEntryPoint):
+                    prefixes.add(self._import_group(entrypoint.module_name))
+        if not prefixes:
+            return {}
+        dotted_prefixes = tuple(f'{prefix}.' for prefix in prefixes)
+
+        tracked = {}
+        for module_name, module in list(sys.modules.items()):
+            if module_name in prefixes or module_name.startswith(dotted_prefixes):
+                if module_name.startswith(f'{__package__}.') or module_name in self._preloaded_modules:
+                    continue
+                path = getattr(module, '__file__', None)
+                if path and path.endswith('.py'):
+                    tracked[module_name] = path
+        return tracked
+
+    @staticmethod
+    def _source_stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _source_hash(path):
+        try:
+            with open(path, 'rb') as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def _snapshot_sources(self):
+        # Record the baseline that incremental hot reloads compare against; this runs after every collection, so
+        # files are only stat'ed here (see _changed_modules)
+        self._source_fingerprints = {module_name: (path, self._source_stat(path))
+                                     for module_name, path in self._tracked_modules().items()}
+
+    def _changed_modules(self):
+        changed = set()
+        for module_name, (path, stat) in self._source_fingerprints.items():
+            current = self._source_stat(path)
+            if current == stat:
+                continue
+            if stat is None or current is None:
+                changed.add(module_name)
+                continue
+            # The file looks different. Hash it, to tell an edit from a touch; that needs the hash of the baseline,
+            # which is only known if an earlier reload hashed the file (otherwise it's taken to have changed)
+            digest = self._source_hash(path)
+            hashed_stat, baseline = self._source_hashes.get(path, (None, None))
+            if hashed_stat != stat or digest != baseline:
+                changed.add(module_name)
+            self._source_hashes[path] = (current, digest)
+        return changed
+
+    @staticmethod
+    def _module_references(module, submodules=True):
+        # Names of modules whose objects (modules, classes or functions) are bound in this module's namespace;
+        # a package's submodules are bound to it on import, so only count them if `submodules`
+        references = set()
+        for value in list(vars(module).values()):
+            if isinstance(value, types.ModuleType):
+                if submodules or not value.__name__.startswith(f'{module.__name__}.'):
+                    references.add(value.__name__)
+            elif isinstance(value, (type, types.FunctionType)):
+                references.add(getattr(value, '__module__', None))
+        return references
+
+    def _dependent_closure(self, changed_modules, candidates):
+        # Invert the reference graph among candidates, then walk it from the changed modules
+        dependents = {}
+        for module_name in candidates:
+            module = sys.modules.get(module_name)
+            if module is None:
+                continue
+            for reference in self._module_references(module):
+                if reference in candidates and reference != module_name:
+                    dependents.setdefault(reference, set()).add(module_name)
+
+        closure = set(changed_modules)
+        frontier = list(changed_modules)
+        while frontier:
+            for dependent in dependents.get(frontier.pop(), ()):
+                if dependent not in closure:
+                    closure.add(dependent)
+                    frontier.append(dependent)
+        return closure
+
+    def _reload_changed(self) -> 'PluginChanges':
+        changes = PluginChanges()
+
+        changed_modules = self._changed_modules()
+        if not changed_modules:
+            msg.logMessage('No plugin sources have changed; nothing to reload.')
+            return changes
+
+        closure = self._dependent_closure(changed_modules, set(self._source_fingerprints))
+        msg.logMessage('Reloading changed plugin modules:', *sorted(closure), sep='\n')
+
+        # Find every loaded plugin defined in (or loaded from) a module that's being reloaded
+        affected = []
+        for type_name, entrypoints_of_type in self._entrypoints.items():
+            for name, entrypoint in entrypoints_of_type.items():
+                plugin_class = self._load_cache.lookup(type_name, name)
+                if plugin_class is None or isinstance(entrypoint, LiveEntryPoint):
+                    continue
+                if isinstance(plugin_class, LazyPluginProxy) and not plugin_class.loaded:
+                    continue  # never imported; it will pick up the new source on first use
+                if entrypoint.module_name in closure or getattr(plugin_class, '__module__', None) in closure:
+                    affected.append((type_name, name, entrypoint))
+
+        for module_name in closure:
+            sys.modules.pop(module_name, None)
+
+        for type_name, name, entrypoint in affected:
+            try:
+                with self.trace.span(name, 'import', type_name=type_name, reload=True):
+                    plugin_class = entrypoint.load()
+                plugin = plugin_class() if getattr(plugin_class, 'is_singleton', False) else plugin_class
+            except (Exception, SystemError) as ex:
+                msg.logMessage(f"Unable to reload {name} plugin from module: {entrypoint.module_name}", msg.ERROR)
+                msg.logError(ex)
+                msg.notifyMessage(repr(ex), title=f'An error occurred while reloading the "{name}" plugin.')
+                continue
+
+            # Swap the new version in place
+            self._load_cache.set(type_name, name, plugin_class)
+            self._register_plugin(type_name, name, plugin)
+            changes.replace(type_name, name)
+
+        self._snapshot_sources()
+        self._notify(Filters.UPDATE, changes)
+        return changes
+
+    def _discover_plugins(self):
+        with self.trace.span('discover plugins', 'discovery'):
+            # make sure the entrypoint index reflects the current environment (only rescans if something changed)
+            self._index.refresh()
+            self._register_types()
+
+            # for each plugin type, compare what's installed with what was discovered before
+            discovered = {}
+            for type_name in self.plugin_types.keys():
+                with self.trace.span(type_name, 'scan'):
+                    discovered[type_name] = self._discover_type(type_name)
+
+            # Retire plugins whose entrypoints were uninstalled or changed, before queueing their replacements
+            stale = [(type_name, name) for type_name, (stale_names, _) in discovered.items() for name in stale_names]
+            if stale and self.state != State.READY:
+                # Plugins are only unloaded between collections (as in `unload_plugin`); leave these, and their
+                # replacements, until this collection completes, then collect again
+                msg.logMessage('Plugins changed during collection; they will be retired once it completes:',
+                               *(f'{type_name}:{name}' for type_name, name in stale), sep='\n')
+                self._recollect = True
+                discovered = {type_name: ([], {name: entrypoint for name, entrypoint in fresh.items()
+                                               if name not in stale_names})
+                              for type_name, (stale_names, fresh) in discovered.items()}
+                stale = []
+            if stale:
+                unloaded_modules = self._retire_plugins(stale)
+                msg.logMessage('Retired plugins that are no longer installed (or have changed):',
+                               *(f'{type_name}:{name}' for type_name, name in stale), *unloaded_modules, sep='\n')
+                removed = PluginChanges()
+                for type_name, name in stale:
+                    removed.remove(type_name, name)
+                self._notify(Filters.UPDATE, removed)
+
+            self.state = State.DISCOVERING
+            for type_name, (_, fresh) in discovered.items():
+                # ... cache and queue them
+                self._entrypoints.update(type_name, fresh)
+                for entrypoint in fresh.values():
+                    self._queue_load(type_name, entrypoint)
+                if fresh:
+                    msg.logMessage(f"Discovered {type_name} entrypoints:", *fresh.values(), sep='\n')
+
+        if self.state == State.DISCOVERING:
+            self.state = State.LOADING
+
+    def _queue_load(self, type_name, entrypoint):
+        # A new attempt is on its way; callers waiting on the plugin from now on wait for its outcome, rather than
+        # being handed the last attempt's error
+        with self._pending_lock:
+            self._load_errors.pop((type_name, entrypoint.name), None)
+        self._load_queue.put((type_name, entrypoint))
+
+    def _discover_type(self, type_name):
+        # Diff the installed entrypoints of a type against those already discovered; returns the names of discovered
+        # plugins that are gone (or whose entrypoints changed), and the entrypoints to load by name. Unchanged plugins
+        # are left alone, so re-collecting (i.e. after a package is installed) costs time in proportion to the change;
+        # plugins that failed to load are tried again.
+        # get all entrypoints matching that group
+        group = self._index.get_group_named(f'xicam.plugins.{type_name}')
+        group_all = self._index.get_group_all(f'xicam.plugins.{type_name}')
+        known = self._entrypoints[type_name]
+
+        # Only import the type itself once there are plugins of that type
+        if (group or known) and not self._has_type(type_name):
+            return [], {}
+
+        # check for duplicate names
+        self._check_shadows(group, group_all)
+
+        stale, fresh = [], {}
+        for name, entrypoint in known.items():
+            if isinstance(entrypoint, LiveEntryPoint):
+                continue  # registered in memory; not installed
+            current = group.get(name)
+            if current is None or current.name in self._blacklist or \
+                    self._entrypoint_identity(current) != self._entrypoint_identity(entrypoint):
+                stale.append(name)
+
+        for name, entrypoint in group.items():
+            if entrypoint.name in self._blacklist or isinstance(known.get(name), LiveEntryPoint):
+                continue
+            if name not in known or name in stale or (type_name, name) in self._load_errors:
+                fresh[name] = entrypoint
+        return stale, fresh
+
+    @staticmethod
+    def _entrypoint_identity(entrypoint):
+        # Entrypoints are re-parsed whenever the index is rebuilt, so compare what they point at, not the objects
+        distro = getattr(entrypoint, 'distro', None)
+        return (entrypoint.module_name, entrypoint.object_name,
+                getattr(distro, 'name', None), getattr(distro, 'version', None))
+
+    @staticmethod
+    def _check_shadows(group, group_all):
+        # Warn the user if entrypoint names may shadow each other
+        if len(group_all) != len(group):
+            # There are some name collisions. Let's go digging for them.
+            for name, matches in itertools.groupby(group_all, lambda ep: ep.name):
+                matches = list(matches)
+                if len(matches) != 1:
+                    winner = group[name]
+                    warnings.warn(
+                        f"There are {len(matches)} conflicting entrypoints which share the name {name!r}:\n{matches}"
+                        f"Loading entrypoint from {winner.module_name} and ignoring others.")
+
+    def _load_plugins(self):
+        if self.headless:
+            # There's no event loop to hand instantiation off to; collect everything on this thread. Collections
+            # started from other threads (i.e. by venvChanged) wait their turn, so that one can't complete another's
+            with self._collect_lock:
+                self._load_entrypoints()
+                self._instantiate_plugin()
+                while self.state == State.INSTANTIATING:
+                    self._instantiate_plugin()
+            return
+
+        from xicam.core import threads
+        threads.method(threadkey='entrypoint-loader',
+                       showBusy=False,
+                       cancelIfRunning=False)(self._load_entrypoints)()  # progress state managed independently
+
+    def _load_entrypoints(self):
+        # Failures and probe results recorded while loading are saved once, at the end
+        with self._failures.batch(), self._probes.batch():
+            if self.probe:
+                self._probe_queued()
+
+            if self.load_workers > 1:
+                self._load_plugins_concurrently()
+            else:
+                self._load_plugins_serially()
+
+    def _load_plugins_serially(self):
+        started_instantiating = False
+
+        # For every entrypoint in the load queue
+        while not self._load_queue.empty():
+            type_name, entrypoint = self._load_queue.get()
+
+            # load it
+            self._load_plugin(type_name, entrypoint)
+
+            if not started_instantiating:  # If this is the first load
+                # Start an event chain to pull from the queue
+                self._schedule_instantiate()
+                started_instantiating = True
+
+            # mark it as completed
+            self._load_queue.task_done()
+
+        # Finished loading, progress
+        if self.state == State.LOADING:
+            self.state = State.INSTANTIATING
+
+    def _load_plugins_concurrently(self):
+        # Each worker takes the highest priority entrypoint from the load queue whenever it frees up, so that plugins
+        # requested (and promoted) during loading still jump the queue. Imports within a package are serialized to
+        # avoid import lock deadlocks: an entrypoint whose package another worker is importing is set aside, and
+        # queued again once that worker is done with the package.
+        busy_groups = set()
+        set_aside = {}  # import group: [(type_name, entrypoint)]
+        lock = threading.Lock()
+        instantiate_started = threading.Event()
+
+        def next_item():
+            with lock:
+                while True:
+                    try:
+                        type_name, entrypoint = self._load_queue.get()
+                    except Empty:
+                        return None
+                    self._load_queue.task_done()
+                    group = self._import_group(entrypoint.module_name)
+                    if group not in busy_groups:
+                        busy_groups.add(group)
+                        return group, type_name, entrypoint
+                    set_aside.setdefault(group, []).append((type_name, entrypoint))
+
+        def release(group):
+            with lock:
+                busy_groups.discard(group)
+                for item in set_aside.pop(group, []):
+                    self._load_queue.put(item)
+
+        def load():
+            while True:
+                item = next_item()
+                if item is None:
+                    return
+                group, type_name, entrypoint = item
+                try:
+                    # _load_plugin feeds the instantiate queue as each import completes
+                    self._load_plugin(type_name, entrypoint)
+                finally:
+                    release(group)
+
+                # Start an event chain to pull from the queue as soon as the first plugin arrives
+                with lock:
+                    if not instantiate_started.is_set():
+                        instantiate_started.set()
+                        self._schedule_instantiate()
+
+        with ThreadPoolExecutor(max_workers=self.load_workers, thread_name_prefix='entrypoint-loader') as executor:
+            for future in [executor.submit(load) for _ in range(self.load_workers)]:
+                future.result()
+
+        # Finished loading, progress
+        if self.state == State.LOADING:
+            self.state = State.INSTANTIATING
+
+    def _probe_queued(self):
+        # Probe everything that's queued and not yet vetted, then queue it all again (in priority order)
+        queued = []
+        while not self._load_queue.empty():
+            queued.append(self._load_queue.get())
+            self._load_queue.task_done()
+        self._probe_entrypoints([item for item in queued if self._needs_probe(*item)])
+        for item in queued:
+            self._load_queue.put(item)
+
+    def _needs_probe(self, type_name, entrypoint):
+        return (not isinstance(entrypoint, LiveEntryPoint)
+                and not self._is_lazy(type_name, entrypoint)
+                and self._load_cache.lookup(type_name, entrypoint.name) is None
+                and self._failures.check(type_name, entrypoint) is None
+                and self._probes.check(type_name, entrypoint) is None)
+
+    def _probe_entrypoints(self, items):
+        if not items:
+            return
+        msg.logMessage(f'Probing {len(items)} plugin entrypoints out of process...')
+
+        def probe(item):
+            type_name, entrypoint = item
+            with self.trace.span(entrypoint.name, 'probe', type_name=type_name) as args:
+                result = probe_entrypoint(entrypoint, self.probe_timeout, self._import_group(entrypoint.module_name))
+                args['ok'] = result.ok
+            self._record_probe(type_name, entrypoint, result)
+
+        workers = min(self.probe_workers or os.cpu_count() or 1, len(items))
+        with self._failures.batch(), self._probes.batch(), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='entrypoint-probe') as executor:
+            list(executor.map(probe, items))
+
+    def _record_probe(self, type_name, entrypoint, result: ProbeResult):
+        if result.ok:
+            msg.logMessage(f'Probed {entrypoint.name}: imported in {int(result.elapsed * 1000)} ms', level=msg.DEBUG)
+            self._probes.record(type_name, entrypoint, result.sources, result.elapsed, result.memory)
+        else:
+            msg.logMessage(f'Probing {entrypoint.name} from module {entrypoint.module_name} failed: {result.error}',
+                           level=msg.ERROR)
+            self._failures.record(type_name, entrypoint, result.error, sources=result.sources)
+
+    @staticmethod
+    def _import_group(module_name):
+        # Modules sharing a top-level package share a group; for namespace packages (i.e. xicam), the group is the
+        # first sub-package instead, so that independent xicam.* plugins can still import in parallel
+        parts = module_name.split('.')
+        top_level = sys.modules.get(parts[0])
+        if top_level is None and len(parts) > 1:
+            try:
+                spec = importlib.util.find_spec(parts[0])
+            except (ImportError, ValueError):
+                spec = None
+            is_namespace = spec is not None and spec.origin in (None, 'namespace')
+        else:
+            is_namespace = top_level is not None and getattr(top_level, '__file__', None) is None
+        if is_namespace and len(parts) > 1:
+            return '.'.join(parts[:2])
+        return parts[0]
+
+    def _load_plugin(self, type_name, entrypoint: entrypoints.EntryPoint):
+        # if the entrypoint was already loaded into cache and queued, do nothing
+        if self._load_cache.lookup(type_name, entrypoint.name):
+            return
+
+        # Don't repeat a failed import that is bound to fail again, whether it would be imported now or lazily
+        is_live = isinstance(entrypoint, LiveEntryPoint)
+        if not is_live and self._skip_failed(type_name, entrypoint):
+            return
+
+        # For lazy types, defer the import until the plugin is actually used
+        if self._is_lazy(type_name, entrypoint):
+            plugin_proxy = self._load_cache.setdefault(
+                type_name, entrypoint.name,
+                LazyPluginProxy(type_name, entrypoint, load=self._load_lazy_plugin, on_load=self._lazy_plugin_loaded))
+            self._instantiate_queue.put((type_name, entrypoint, plugin_proxy))
+            return
+
+        # Only import vetted entrypoints in probe mode (those requested early may not have been probed yet)
+        if self.probe and self._needs_probe(type_name, entrypoint):
+            self._probe_entrypoints([(type_name, entrypoint)])
+            if self._skip_failed(type_name, entrypoint):
+                return
+
+        try:
+            # Load the entrypoint (unless already cached), cache it, and put it on the instantiate queue
+            msg.logMessage(f'Loading entrypoint {entrypoint.name} from module: {entrypoint.module_name}')
+            with load_timer() as elapsed, self.trace.span(entrypoint.name, 'import', type_name=type_name):
+                plugin_class = self._load_cache.lookup(type_name, entrypoint.name) or entrypoint.load()
+            plugin_class = self._load_cache.setdefault(type_name, entrypoint.name, plugin_class)
+        except (Exception, SystemError) as ex:
+            msg.logMessage(f"Unable to load {entrypoint.name} plugin from module: {entrypoint.module_name}", msg.ERROR)
+            msg.logError(ex)
+            if not is_live:
+                self._failures.record(type_name, entrypoint, ex)
+            self._fail_pending(type_name, entrypoint.name, ex)
+            msg.notifyMessage(
+                repr(ex), title=f'An error occurred while starting the "{entrypoint.name}" plugin.', level=msg.CRITICAL
+            )
+
+        else:
+            msg.logMessage(f"{int(elapsed() * 1000)} ms elapsed while loading {entrypoint.name}",
+                           level=msg.INFO)
+            self._instantiate_queue.put((type_name, entrypoint, plugin_class))
+
+    def _skip_failed(self, type_name, entrypoint):
+        # True if `entrypoint` failed to load before and nothing has changed since (see FailureCache); anyone waiting
+        # on it is told why
+        error = self._failures.check(type_name, entrypoint)
+        if error is None:
+            return False
+        msg.logMessage(f'Skipping {entrypoint.name} plugin, which failed to load: {error}', level=msg.WARNING)
+        self._fail_pending(type_name, entrypoint.name,
+                           ImportError(f'The {entrypoint.name} plugin failed to load and has not changed since: '
+                                       f'{error}', name=entrypoint.module_name))
+        msg.notifyMessage(f'The "{entrypoint.name}" plugin was skipped; it failed to load previously.',
+                          level=msg.WARNING)
+        return True
+
+    def _is_lazy(self, type_name, entrypoint):
+        # Live entrypoints are already in memory; singletons get instantiated immediately anyway
+        return (type_name in self.lazy_types
+                and not isinstance(entrypoint, LiveEntryPoint)
+                and not getattr(self.plugin_types[type_name], 'is_singleton', False))
+
+    def _load_lazy_plugin(self, type_name, entrypoint):
+        # Deferred imports are traced (and their failures remembered) like those made during collection
+        try:
+            with load_timer() as elapsed, self.trace.span(entrypoint.name, 'import', type_name=type_name, lazy=True):
+                plugin_class = entrypoint.load()
+        except (Exception, SystemError) as ex:
+            msg.logMessage(f"Unable to load {entrypoint.name} plugin from module: {entrypoint.module_name}", msg.ERROR)
+            msg.logError(ex)
+            self._failures.record(type_name, entrypoint, ex)
+            raise
+        msg.logMessage(f'Lazily loaded {entrypoint.name} from module {entrypoint.module_name} in '
+                       f'{int(elapsed() * 1000)} ms', level=msg.INFO)
+        return plugin_class
+
+    def _lazy_plugin_loaded(self, plugin_proxy: LazyPluginProxy, plugin_class):
+        # Swap the real class in, so later lookups skip the proxy
+        type_name, name = plugin_proxy.type_name, plugin_proxy.name
+        self._load_cache.swap(type_name, name, plugin_proxy, plugin_class)
+        if self._plugins.lookup(type_name, name) is plugin_proxy:
+            self._register_plugin(type_name, name, plugin_class)
+
+    def _schedule_instantiate(self):
+        # Headless collection runs the pump itself (see _load_plugins)
+        if self.headless:
+            return
+
+        # Post the instantiation pump to the event loop, unless it's already waiting there
+        with self._pump_lock:
+            if self._pump_scheduled:
+                return
+            self._pump_scheduled = True
+        from xicam.core import threads
+        threads.invoke_as_event(self._instantiate_plugin)
+
+    def _instantiate_plugin(self):
+        with self._pump_lock:
+            self._pump_scheduled = False
+
+        # Instantiate as many queued plugins as fit in this tick's time budget (at least one)
+        if not self._instantiate_queue.empty():
+            with self.trace.span('instantiate tick', 'tick') as tick:
+                tick_start = default_timer()
+                instantiated = 0
+                while not self._instantiate_queue.empty():
+                    self._instantiate_next()
+                    instantiated += 1
+                    if default_timer() - tick_start >= self.instantiate_budget:
+                        break
+                tick['plugins'] = instantiated
+
+        # Send coalesced UPDATEs once the notification window has passed
+        self._flush_notifications()
+
+        # If this was the last plugin
+        if self._load_queue.empty() and self._instantiate_queue.empty() and self.state in [State.INSTANTIATING,
+                                                                                           State.READY]:
+            self.state = State.READY
+            msg.logMessage('Plugin collection completed!')
+            msg.hideProgress()
+            self._snapshot_sources()
+            self._notify(Filters.COMPLETE)
+            if self._recollect:
+                self._recollect = False
+                self.collect_plugins()
+
+        if not self.state == State.READY:  # if we haven't reached the last task, but there's nothing queued
+            self._schedule_instantiate()  # return to the event loop, but come back soon
+
+    def _instantiate_next(self):
+        try:
+            type_name, entrypoint, plugin_class = self._instantiate_queue.get()
+        except Empty:
+            return
+
+        # if this plugin was already instantiated earlier, skip it; mark done
+        if self._plugins.lookup(type_name, entrypoint.name) is None:
+
+            success = False
+            replacing = (type_name, entrypoint.name) in self._replacing
+            self._replacing.discard((type_name, entrypoint.name))
+
+            # ... and instantiate it (as long as its supposed to be singleton)
+            if getattr(plugin_class, 'is_singleton', False):
+                msg.logMessage(f"Instantiating {entrypoint.name} plugin object.", level=msg.INFO)
+                try:
+                    with load_timer() as elapsed, self.trace.span(entrypoint.name, 'instantiate', type_name=type_name):
+                        self._register_plugin(type_name, entrypoint.name, plugin_class())
+                except (Exception, SystemError) as ex:
+                    msg.logMessage(
+                        f"Unable to instantiate {entrypoint.name} plugin from module: {entrypoint.module_name}",
+                        msg.ERROR)
+                    msg.logError(ex)
+                    self._fail_pending(type_name, entrypoint.name, ex)
+                    msg.notifyMessage(repr(ex),
+                                      title=f'An error occurred while starting the "{entrypoint.name}" plugin.')
+                    if replacing:
+                        # The plugin it replaces is gone either way
+                        self._notify(Filters.UPDATE, PluginChanges(removed={type_name: [entrypoint.name]}))
+                else:
+                    msg.logMessage(f"{int(elapsed() * 1000)} ms elapsed while instantiating {entrypoint.name}",
+                                   level=msg.INFO)
+                    success = True
+
+            else:
+                self._register_plugin(type_name, entrypoint.name, plugin_class)
+                success = True
+
+            if success:
+                self._resolve_pending(type_name, entrypoint.name, self._plugins.lookup(type_name, entrypoint.name))
+                msg.logMessage(f"Successfully collected {entrypoint.name} plugin.", level=msg.INFO)
+                msg.showProgress(self._progress_count(), maxval=self._entrypoint_count())
+                changes = PluginChanges()
+                (changes.replace if replacing else changes.add)(type_name, entrypoint.name)
+                self._notify(Filters.UPDATE, changes)
+
+        # mark it as completed
+        self._instantiate_queue.task_done()
+
+    def _register_plugin(self, type_name, name, plugin):
+        self._plugins.set(type_name, name, plugin)
+
+    def _forget_plugin(self, type_name, name):
+        self._plugins.pop(type_name, name)
+
+    def _register_entrypoint(self, type_name, name, entrypoint):
+        self._entrypoints.set(type_name, name, entrypoint)
+
+    def _forget_entrypoint(self, type_name, name):
+        self._entrypoints.pop(type_name, name)
+
+    @staticmethod
+    def _match_by_name(registry: PluginRegistry, name, type_name):
+        # Returns (match, type_name); a name shared by several types is only ambiguous if type_name isn't given. Both
+        # are single lookups (see PluginRegistry.matches)
+        if type_name:
+            return registry.lookup(type_name, name), type_name
+        matches = registry.matches(name)
+        if len(matches) > 1:
+            raise ValueError('Multiple plugins with the same name but different types exist. '
+                             'Must specify type_name.')
+        for match_type_name, match in matches.items():
+            return match, match_type_name
+        return None, None
+
+    def _get_plugin_by_name(self, name, type_name):
+        return self._match_by_name(self._plugins, name, type_name)[0]
+
+    def _get_entrypoint_by_name(self, name, type_name):
+        return self._match_by_name(self._entrypoints, name, type_name)
+
+    def get_plugin_by_name(self, name, type_name=None, timeout=10):
+        """
+        Find a collected plugin named `name`, optionally by also specifying the type of plugin.
+
+        If plugins are still being collected, the requested plugin is loaded immediately, and this blocks until it is
+        instantiated. Any number of threads may wait on the same plugin; they are woken as soon as it is collected.
+
+        Parameters
+        ----------
+        name : str
+            name of the plugin to get
+        type_name : str
+            type of the plugin to get (optional)
+        timeout : float
+            seconds to wait for the plugin to be collected before raising a TimeoutError
+
+        Returns
+        -------
+        object
+            the matching plugin object (may be a class or instance), or None if not found
+
+        Raises
+        ------
+        TimeoutError
+            if the plugin wasn't collected within `timeout`
+        Exception
+            if the plugin failed to load or instantiate, the original exception is re-raised
+        """
+        return_plugin = self._get_plugin_by_name(name, type_name)
+
+        if return_plugin:
+            return return_plugin
+
+        # If still actively collecting plugins
+        if self.state != State.READY:
+            # find the matching entrypoint
+            entrypoint, type_name = self._get_entrypoint_by_name(name, type_name)
+
+            if not entrypoint:
+                raise NameError(f'The plugin named {name} of type {type_name} could not be discovered. '
+                                f'Check your installation integrity.')
+
+            # Register interest before loading, so the result can't be missed
+            future = self._pending_future(type_name, name)
+
+            # Move it (and other plugins of its type) to the front of the queues
+            self._promote(type_name, name)
+
+            # Load it immediately; it will move to top of instantiate queue as well
+            msg.logMessage(f"Immediately loading {entrypoint.name}.", level=msg.INFO)
+            self._load_plugin(type_name, entrypoint)
+
+            # It may have been collected while the future was being set up
+            return_plugin = self._get_plugin_by_name(name, type_name)
+            if return_plugin:
+                return return_plugin
+
+            # Add another instantiate event to the Qt event queue, so that it triggers in the next event loop
+            self._schedule_instantiate()
+
+            # wait for it to load
+            return_plugin = self._wait_for(future, name, timeout)
+
+        return return_plugin
+
+    def _priority(self, type_name, name):
+        return (self._promoted_plugins.get((type_name, name), 0),
+                self._promoted_types.get(type_name, 0),
+                self.plugin_priorities.get(name, 0),
+                self.type_priorities.get(type_name, 0))
+
+    def _promote(self, type_name, name):
+        rank = next(self._promotion_counter)
+        self._promoted_plugins[(type_name, name)] = rank
+        self._promoted_types[type_name] = rank
+        self._load_queue.reprioritize()
+        self._instantiate_queue.reprioritize()
+
+    def _wait_for(self, future: Future, name, timeout):
+        if not self.headless:
+            from xicam.core import threads
+
+            if threads.is_main_thread():
+                # Plugins are instantiated on the main thread, so keep its event loop running while waiting
+                from qtpy.QtCore import QEventLoop, QTimer
+
+                if not future.done():
+                    loop = QEventLoop()
+                    future.add_done_callback(lambda _: threads.invoke_in_main_thread(loop.quit))
+                    QTimer.singleShot(int(timeout * 1000), loop.quit)
+                    if not future.done():
+                        loop.exec_()
+                if not future.done():
+                    raise TimeoutError(f"Plugin named {name} waited too long to instantiate and timed out")
+                return future.result()
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Plugin named {name} waited too long to instantiate and timed out")
+
+    def _pending_future(self, type_name, name) -> Future:
+        with self._pending_lock:
+            future = self._pending.get((type_name, name))
+            if future is None:
+                future = self._pending[(type_name, name)] = Future()
+                # If it already failed, don't wait for an outcome that will never come
+                if (type_name, name) in self._load_errors:
+                    future.set_exception(self._load_errors[(type_name, name)])
+            return future
+
+    def _resolve_pending(self, type_name, name, plugin):
+        with self._pending_lock:
+            self._load_errors.pop((type_name, name), None)
+            future = self._pending.pop((type_name, name), None)
+        if future is not None and not future.done():
+            future.set_result(plugin)
+
+    def _fail_pending(self, type_name, name, ex):
+        with self._pending_lock:
+            self._load_errors[(type_name, name)] = ex
+            future = self._pending.pop((type_name, name), None)
+        if future is not None and not future.done():
+            future.set_exception(ex)
+
+    def get_plugins_by_names(self, names, type_name=None, timeout=10):
+        """
+        Find many collected plugins at once; i.e. to resolve every node of a workflow.
+
+        Plugins that are already collected are resolved without waiting; any others are handled as in
+        `get_plugin_by_name`, with `timeout` applied to each.
+
+        Parameters
+        ----------
+        names : Iterable[str]
+            names of the plugins to get
+        type_name : str
+            type of the plugins to get (optional)
+
+        Returns
+        -------
+        dict
+            a mapping from each name to its plugin object (or None if not found)
+        """
+        plugins = {}
+        for name in names:
+            if name not in plugins:
+                plugins[name] = self._get_plugin_by_name(name, type_name)
+
+        for name, plugin in plugins.items():
+            if not plugin:
+                plugins[name] = self.get_plugin_by_name(name, type_name, timeout=timeout)
+
+        return plugins
+
+    def get_plugins_of_type(self, type_name):
+        return list(self._plugins[type_name].values())
+
+    def describe(self, name, type_name=None) -> PluginMetadata:
+        """
+        Describe a discovered plugin without importing it (i.e. to list it in a menu before it's collected).
+
+        Metadata is read from the plugin's sidecar file (see `pluginmetadata.read_sidecar`) and its entrypoint. If the
+        plugin class has already been imported, anything else is filled in from the class.
+
+        Parameters
+        ----------
+        name : str
+            name of the plugin to describe
+        type_name : str
+            type of the plugin (optional)
+
+        Raises
+        ------
+        NameError
+            if no plugin named `name` was discovered
+        """
+        entrypoint, type_name = self._get_entrypoint_by_name(name, type_name)
+        if not entrypoint:
+            raise NameError(f'The plugin named {name} of type {type_name} could not be discovered.')
+        return self._describe(type_name, entrypoint)
+
+    def describe_plugins(self, type_name) -> List[PluginMetadata]:
+        """ Describe all discovered plugins of a type, without importing them; see `describe`."""
+        return [self._describe(type_name, entrypoint) for entrypoint in list(self._entrypoints[type_name].values())]
+
+    def _describe(self, type_name, entrypoint):
+        name = entrypoint.name
+        if isinstance(entrypoint, LiveEntryPoint):
+            sidecar, plugin_class = {}, entrypoint.object
+        else:
+            sidecar = self._index.get_metadata(f'xicam.plugins.{type_name}', name)
+            plugin_class = self._load_cache.lookup(type_name, name)
+            if isinstance(plugin_class, LazyPluginProxy):
+                plugin_class = plugin_class.load() if plugin_class.loaded else None
+
+        for key in ('name', 'type_name'):
+            sidecar.pop(key, None)
+        distro = getattr(entrypoint, 'distro', None)
+        sidecar.setdefault('module_name', entrypoint.module_name)
+        sidecar.setdefault('object_name', entrypoint.object_name)
+        sidecar.setdefault('distro', distro.name if distro else None)
+        sidecar.setdefault('is_singleton', getattr(self.plugin_types[type_name], 'is_singleton', False))
+        metadata = PluginMetadata(name, type_name, **sidecar)
+
+        if plugin_class is not None:
+            metadata.update(PluginMetadata.from_class(name, type_name, plugin_class))
+        return metadata
+
+    def attach(self, callback, filter=None, with_changes=False, coalesce=True):
+        """
+        Subscribe a callback to receive notifications. If a filter is used, only matching notifications are sent.
+        See `Filters` for options.
+
+        If `with_changes`, the callback is passed a `PluginChanges` describing which plugins changed (which may be
+        empty, i.e. for `Filters.COMPLETE`).
+
+        If `coalesce` (the default), `Filters.UPDATE` notifications are batched: the callback is notified at most once
+        per `notify_interval` while plugins are collected (and always before `Filters.COMPLETE`), with the changes
+        merged. Pass ``coalesce=False`` to be notified synchronously as each plugin is collected.
+
+        """
+        self._observers.append((callback, filter, with_changes, coalesce))
+
+    def _notify(self, filter=None, changes: PluginChanges = None):
+        """ Notify all observers. Observers attached with filters much mach the emitted filter to be notified."""
+        if filter != Filters.UPDATE:
+            # Coalesced updates are always delivered first
+            self._flush_notifications(force=True)
+            self._deliver(filter, changes)
+            return
+
+        self._deliver(filter, changes, coalesce=False)
+        with self._coalesce_lock:
+            self._coalesced_changes.merge(changes or PluginChanges())
+            if self._coalesce_started is None:
+                self._coalesce_started = default_timer()
+        # Outside of a collection cycle there's no later tick to flush on
+        self._flush_notifications(force=self.state == State.READY)
+
+    def _flush_notifications(self, force=False):
+        with self._coalesce_lock:
+            if self._coalesce_started is None:
+                return
+            if not force and default_timer() - self._coalesce_started < self.notify_interval:
+                return
+            changes, self._coalesced_changes = self._coalesced_changes, PluginChanges()
+            self._coalesce_started = None
+        self._deliver(Filters.UPDATE, changes, coalesce=True)
+
+    def _deliver(self, filter, changes, coalesce=None):
+        # If `coalesce` is given, only notify observers attached with a matching `coalesce`
+        for callback, obsfilter, with_changes, obscoalesce in list(self._observers):
+            if coalesce is not None and obscoalesce != coalesce:
+                continue
+            if obsfilter == filter or not obsfilter:
+                with self.trace.span(getattr(callback, '__qualname__', repr(callback)), 'observer',
+                                     filter=getattr(filter, 'name', None)):
+                    if with_changes:
+                        callback(changes or PluginChanges())
+                    else:
+                        callback()
+
+    def startup_report(self) -> StartupReport:
+        """
+        Get a queryable report of the time (and memory) spent discovering, importing, and instantiating each plugin,
+        and in observer callbacks.
+
+        See `StartupReport`; use `StartupReport.save_chrome_trace` to export for chrome://tracing or Perfetto.
+        """
+        return self.trace.report()
+
+    def export_startup_trace(self, path):
+        """ Save the startup trace as a Chrome-trace/Perfetto JSON file at `path`."""
+        self.startup_report().save_chrome_trace(path)
+
+    def retry_failed_plugins(self, type_name=None, name=None):
+        """
+        Forget that plugins failed to load on earlier launches, so that they are retried the next time they are
+        collected. Forgets the plugin named `name` of `type_name`, all failed plugins of `type_name` if no `name` is
+        given, or all failed plugins.
+        """
+        self._failures.forget(type_name, name)
+
+    def venvChanged(self):
+        # The active environment changed; drop the in-memory index so it is re-validated against the new site dirs.
+        # Re-collecting then only loads new or changed entrypoints, and retires those that were removed.
+        self._index.invalidate()
+        self.collect_plugins()
+
+    def _entrypoint_count(self):
+        return self._entrypoints.count()
+
+    def _progress_count(self):
+        return self._plugins.count()
+
+    def getPluginsOfCategory(self, type_name):
+        raise NotImplementedError('This method has been renamed to follow snake_case')
+        warnings.warn('Transition to snake_case in progress...', DeprecationWarning)
+        return self.get_plugins_of_type(type_name)
+
+    def collectPlugins(self):
+        raise NotImplementedError('This method has been renamed to follow snake_case')
+        warnings.warn('Transition to snake_case in progress...', DeprecationWarning)
+        return self.collect_plugins()
+
+    def getPluginByName(self, plugin_name, type_name):
+        raise NotImplementedError('This method has been renamed to follow snake_case')
+        warnings.warn('Transition to snake_case in progress...', DeprecationWarning)
+        return self.get_plugin_by_name(plugin_name, type_name)
+
+
+# A light class to mimic EntryPoint for live objects
+class LiveEntryPoint(entrypoints.EntryPoint):
+    def __init__(self, name, object, extras=None, distro=None):
+        super(LiveEntryPoint, self).__init__(name,
+                                             module_name='[live]',
+                                             object_name=object.__name__,
+                                             extras=extras,
+                                             distro=distro)
+        self.object = object
+
+    def load(self):
+        return self.object
@@ -0,0 +1,154 @@
+import os
+import json
+import inspect
+import threading
+from typing import Dict, List
+
+from xicam.core import msg
+
+# Suffix of the sidecar file next to a plugin module (i.e. mypackage/filters.py -> mypackage/filters.xicam-plugin)
+SIDECAR_SUFFIX = '.xicam-plugin'
+
+_sidecar_cache = {}
+_sidecar_lock = threading.Lock()
+
+
+def sidecar_paths(folder, module_name) -> List[str]:
+    """ Candidate sidecar paths for the module `module_name`, installed in the site directory `folder`."""
+    module_path = os.path.join(folder, *module_name.split('.'))
+    return [module_path + SIDECAR_SUFFIX, os.path.join(module_path, '__init__' + SIDECAR_SUFFIX)]
+
+
+def read_sidecar(path) -> Dict[str, dict]:
+    """
+    Read a sidecar file, which maps plugin (entrypoint) names to their metadata as JSON; i.e.::
+
+        {"Gaussian Filter": {"category": "Filters", "icon": "icons/gaussian.png",
+                             "description": "Smooth an image with a gaussian kernel",
+                             "inputs": ["image", "sigma"], "outputs": ["image"]}}
+
+    Files are cached until they change; missing or malformed files read as empty.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _sidecar_lock:
+        cached = _sidecar_cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+    try:
+        with open(path, 'r') as f:
+            metadata = json.load(f)
+        if not isinstance(metadata, dict):
+            raise ValueError('Expected a JSON object mapping plugin names to metadata')
+    except (OSError, ValueError) as ex:
+        msg.logMessage(f'Unable to read plugin metadata from {path}', level=msg.WARNING)
+        msg.logError(ex)
+        metadata = {}
+    with _sidecar_lock:
+        _sidecar_cache[path] = (key, metadata)
+    return metadata
+
+
+class PluginMetadata(object):
+    """
+    A description of a plugin that is available without importing it, for populating menus and palettes.
+
+    Metadata comes from the plugin's sidecar file (see `read_sidecar`) and its entrypoint; once the plugin class has
+    been imported, anything the sidecar doesn't provide is filled in from the class (see `from_class`).
+
+    Attributes
+    ----------
+    name : str
+        The plugin's (entrypoint) name
+    type_name : str
+        The plugin type, i.e. 'ProcessingPlugin'
+    module_name, object_name : str
+        Where the plugin is defined
+    distro : str
+        Name of the distribution providing the plugin (None for plugins registered in memory)
+    category : str
+        Where the plugin is listed (i.e. a workflow palette group)
+    icon : str
+        Path to an icon for the plugin
+    description : str
+        A short human readable description
+    is_singleton : bool
+        Whether the plugin is instantiated when collected
+    inputs, outputs : List[str]
+        Names of declared inputs and outputs (for ProcessingPlugins)
+    extras : dict
+        Any other metadata found in the sidecar
+    """
+
+    fields = ('name', 'type_name', 'module_name', 'object_name', 'distro', 'category', 'icon', 'description',
+              'is_singleton', 'inputs', 'outputs')
+
+    def __init__(self, name, type_name, module_name=None, object_name=None, distro=None, category=None, icon=None,
+                 description=None, is_singleton=False, inputs=None, outputs=None, **extras):
+        self.name = name
+        self.type_name = type_name
+        self.module_name = module_name
+        self.object_name = object_name
+        self.distro = distro
+        self.category = category
+        self.icon = icon
+        self.description = description
+        self.is_singleton = is_singleton
+        self.inputs = list(inputs or [])
+        self.outputs = list(outputs or [])
+        self.extras = extras
+
+    @classmethod
+    def from_class(cls, name, type_name, plugin_class, **fields) -> 'PluginMetadata':
+        """ Describe an imported plugin class; `fields` take precedence over what's found on the class."""
+        inputs, outputs = _declared_vars(plugin_class)
+        description = getattr(plugin_class, 'description', None) or getattr(plugin_class, 'DESCRIPTION', None)
+        if not isinstance(description, str) or not description:
+            docstring = plugin_class.__dict__.get('__doc__')
+            description = inspect.cleandoc(docstring).split('\n\n')[0] if docstring else None
+        category = getattr(plugin_class, 'category', None)
+        if not isinstance(category, str) and callable(getattr(plugin_class, 'getCategory', None)):
+            # i.e. ProcessingPlugin.getCategory; plugins that override it as an instance method can't be asked here
+            try:
+                category = plugin_class.getCategory()
+            except TypeError:
+                category = None
+        icon = getattr(plugin_class, 'icon', None)
+        found = dict(module_name=plugin_class.__module__,
+                     object_name=plugin_class.__qualname__,
+                     category=category if isinstance(category, str) else None,
+                     icon=icon if isinstance(icon, str) else None,
+                     description=description,
+                     is_singleton=getattr(plugin_class, 'is_singleton', False),
+                     inputs=inputs,
+                     outputs=outputs)
+        found.update({key: value for key, value in fields.items() if value is not None})
+        return cls(name, type_name, **found)
+
+    def update(self, other: 'PluginMetadata'):
+        """ Fill in anything missing from `other`."""
+        for field in self.fields:
+            if getattr(self, field) in (None, []):
+                setattr(self, field, getattr(other, field))
+        for key, value in other.extras.items():
+            self.extras.setdefault(key, value)
+        return self
+
+    def to_dict(self) -> dict:
+        """ The metadata as JSON-compatible data; i.e. to write a sidecar from an imported class."""
+        d = {field: getattr(self, field) for field in self.fields}
+        d.update(self.extras)
+        return d
+
+    def __repr__(self):
+        return f'PluginMetadata({self.type_name}:{self.name}, category={self.category!r})'
+
+
+def _declared_vars(plugin_class):
+    # The variables instances actually get (see ProcessingPlugin._compile_vars), in definition order
+    schema = getattr(plugin_class, '_var_schema', ())
+    return ([name for name, _, is_input, _ in schema if is_input],
+            [name for name, _, _, is_output in schema if is_output])
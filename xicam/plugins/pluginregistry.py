@@ -0,0 +1,138 @@
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterable
+
+_missing = object()
+_no_matches = MappingProxyType({})
+
+
+class PluginRegistry(Mapping):
+    """
+    Values (plugins, plugin classes, or entrypoints) by plugin type and name, which any number of threads may read
+    while collection writes to it, without taking a lock.
+
+    ``registry[type_name]`` is an immutable snapshot of one type: a read-only mapping from names to values that never
+    changes once it's handed out, so it's always safe to iterate. Snapshots are built lazily, the first time a type is
+    read after a write, and reused until the next write to that type. Single values can be looked up with `lookup`
+    without building a snapshot, and by name across all types with `matches`, which reads from an index by name kept
+    up to date by the writers.
+
+    Writers (`set`, `pop`, `swap`, ...) are serialised by a lock; a write never disturbs a snapshot that's been handed
+    out, since snapshots are copies.
+    """
+
+    def __init__(self, type_names: Iterable[str] = ()):
+        self._lock = threading.RLock()
+        # Owned by writers; readers only do single (atomic) lookups, or copy them in one step
+        self._entries = {}  # type: Dict[str, Dict[str, Any]]
+        self._versions = {}  # type: Dict[str, int]
+        self._snapshots = {}  # type_name: (version, snapshot)
+        # {name: read-only {type_name: value}}; writers replace (never modify) the mappings, so readers can keep them
+        self._by_name = {}  # type: Dict[str, Mapping[str, Any]]
+        self.add_types(type_names)
+
+    def add_types(self, type_names: Iterable[str]):
+        with self._lock:
+            for type_name in type_names:
+                if type_name not in self._entries:
+                    self._entries[type_name] = {}
+                    self._versions[type_name] = 0
+
+    def __getitem__(self, type_name) -> Mapping:
+        version = self._versions[type_name]
+        cached = self._snapshots.get(type_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # The version is read before copying: if a write sneaks in between, the copy is newer than its tag and is
+        # simply rebuilt on the next read
+        snapshot = MappingProxyType(self._entries[type_name].copy())
+        self._snapshots[type_name] = (version, snapshot)
+        return snapshot
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, type_name, name, default=None):
+        """ The value registered as `name` of `type_name` (or `default`)."""
+        entries = self._entries.get(type_name)
+        return default if entries is None else entries.get(name, default)
+
+    def matches(self, name) -> Mapping:
+        """ Values registered as `name`, by type name (a read-only snapshot)."""
+        return self._by_name.get(name, _no_matches)
+
+    def count(self) -> int:
+        """ The number of values registered across all types."""
+        return sum(len(self._entries[type_name]) for type_name in list(self._entries))
+
+    def _changed(self, type_name):
+        self._versions[type_name] += 1
+
+    def _index(self, type_name, name, value):
+        self._by_name[name] = MappingProxyType({**self._by_name.get(name, _no_matches), type_name: value})
+
+    def _unindex(self, type_name, name):
+        matches = {**self._by_name.get(name, _no_matches)}
+        matches.pop(type_name, None)
+        if matches:
+            self._by_name[name] = MappingProxyType(matches)
+        else:
+            self._by_name.pop(name, None)
+
+    def set(self, type_name, name, value):
+        with self._lock:
+            self._entries[type_name][name] = value
+            self._index(type_name, name, value)
+            self._changed(type_name)
+
+    def update(self, type_name, values: Dict[str, Any]):
+        with self._lock:
+            self._entries[type_name].update(values)
+            for name, value in values.items():
+                self._index(type_name, name, value)
+            self._changed(type_name)
+
+    def pop(self, type_name, name, default=None):
+        with self._lock:
+            value = self._entries[type_name].pop(name, _missing)
+            if value is _missing:
+                return default
+            self._unindex(type_name, name)
+            self._changed(type_name)
+            return value
+
+    def setdefault(self, type_name, name, value):
+        """ Register `value` unless something is already registered as `name`; returns whichever is registered."""
+        with self._lock:
+            entries = self._entries[type_name]
+            if name not in entries:
+                entries[name] = value
+                self._index(type_name, name, value)
+                self._changed(type_name)
+            return entries[name]
+
+    def swap(self, type_name, name, old, new) -> bool:
+        """ Replace the value registered as `name` with `new`, only if it's still `old`."""
+        with self._lock:
+            entries = self._entries[type_name]
+            if entries.get(name, _missing) is not old:
+                return False
+            entries[name] = new
+            self._index(type_name, name, new)
+            self._changed(type_name)
+            return True
+
+    def clear(self):
+        """ Remove every value, keeping the types."""
+        with self._lock:
+            for type_name in self._entries:
+                self._entries[type_name] = {}
+                self._changed(type_name)
+            self._by_name = {}
+
+    def __repr__(self):
+        return f'<PluginRegistry {self.count()} values of {len(self)} types>'
@@ -0,0 +1,63 @@
+import heapq
+import itertools
+import threading
+from queue import Empty
+from typing import Callable, Tuple
+
+
+class PluginScheduler(object):
+    """
+    A thread-safe priority queue of plugin work items, used in place of the manager's load and instantiate queues.
+
+    Items are tuples whose first two members are the plugin's type name and its entrypoint, i.e.
+    ``(type_name, entrypoint)`` or ``(type_name, entrypoint, plugin_class)``. Each item is ranked by calling
+    `priority` with ``(type_name, name)``; higher ranks are scheduled first, and equal ranks are scheduled in the
+    order they were queued.
+
+    Since priorities can change while items are queued (i.e. when a plugin is requested before it's collected), call
+    `reprioritize` to re-rank everything that's still waiting.
+    """
+
+    def __init__(self, priority: Callable[[str, str], Tuple]):
+        self._priority = priority
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _entry(self, item, order=None):
+        type_name, entrypoint = item[0], item[1]
+        rank = self._priority(type_name, entrypoint.name)
+        # heapq is a min-heap; negate the rank so higher priorities come first
+        return tuple(-value for value in rank), next(self._counter) if order is None else order, item
+
+    def put(self, item):
+        with self._lock:
+            heapq.heappush(self._heap, self._entry(item))
+
+    def get(self):
+        """ Remove and return the highest priority item; raises queue.Empty if there are none."""
+        with self._lock:
+            if not self._heap:
+                raise Empty
+            return heapq.heappop(self._heap)[-1]
+
+    def empty(self) -> bool:
+        with self._lock:
+            return not self._heap
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def task_done(self):
+        # Kept for compatibility with the queue.Queue interface
+        pass
+
+    def reprioritize(self):
+        """ Re-rank all waiting items against the current priorities (keeping their queueing order for ties)."""
+        with self._lock:
+            self._heap = [self._entry(item, order) for _, order, item in self._heap]
+            heapq.heapify(self._heap)
+
+    def __len__(self):
+        return self.qsize()
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import signal
+import subprocess
+
+import entrypoints
+
+# Prefix of the line the probe subprocess reports its result on (plugins may print to stdout while importing)
+RESULT_MARKER = 'XICAM-PROBE-RESULT:'
+
+PROBE_SCRIPT = f"""
+import importlib, json, os, sys, time, traceback
+module_name, object_name, package = sys.argv[1:4]
+preloaded = set(sys.modules)
+error, tb_files = None, []
+start = time.perf_counter()
+try:
+    plugin = importlib.import_module(module_name)
+    for attr in filter(None, object_name.split('.')):
+        plugin = getattr(plugin, attr)
+except BaseException as ex:
+    error = repr(ex)
+    tb_files = [frame.filename for frame in traceback.extract_tb(ex.__traceback__)]
+elapsed = time.perf_counter() - start
+module = sys.modules.get(module_name)
+sources = [module.__file__] if getattr(module, '__file__', None) else []
+sources += sorted(loaded.__file__ for name, loaded in list(sys.modules.items())
+                  if name not in preloaded and (name == package or name.startswith(package + '.'))
+                  and getattr(loaded, '__file__', None))
+try:
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    memory = maxrss if sys.platform == 'darwin' else maxrss * 1024
+except ImportError:
+    memory = None
+print({RESULT_MARKER!r} + json.dumps({{'error': error, 'elapsed': elapsed, 'memory': memory,
+                                      'sources': sources + tb_files}}), flush=True)
+"""
+
+
+class ProbeResult(object):
+    """
+    The outcome of importing an entrypoint in a probe subprocess.
+
+    Attributes
+    ----------
+    error : str
+        Why the import failed (i.e. it raised, crashed, or timed out), or None if it succeeded
+    elapsed : float
+        Seconds the import took
+    memory : int
+        Peak RSS of the probe process, in bytes (None if unavailable)
+    sources : List[str]
+        The entrypoint's module file and other files from its package that the import loaded (or, for failures, the
+        files in the traceback)
+    """
+
+    def __init__(self, error=None, elapsed=None, memory=None, sources=None):
+        self.error = error
+        self.elapsed = elapsed
+        self.memory = memory
+        self.sources = sources or []
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        return f'ProbeResult(error={self.error!r}, elapsed={self.elapsed!r}, memory={self.memory!r})'
+
+
+def probe_entrypoint(entrypoint: entrypoints.EntryPoint, timeout: float = 30, package: str = None) -> ProbeResult:
+    """
+    Import `entrypoint` in a fresh Python process, so that an import that hangs or crashes can't take this process
+    down with it. The probe is killed after `timeout` seconds. Files from `package` (defaulting to the module's
+    top-level package) that the import loaded are reported in the result's `sources`.
+    """
+    package = package or entrypoint.module_name.split('.')[0]
+    # The probe must resolve imports exactly as this process does
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, sys.path)))
+    command = [sys.executable, '-c', PROBE_SCRIPT, entrypoint.module_name, entrypoint.object_name or '', package]
+    try:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+                                   env=env, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return ProbeResult(error=f'Importing {entrypoint.module_name} timed out after {timeout} s', elapsed=timeout)
+
+    for line in reversed(completed.stdout.decode(errors='replace').splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return ProbeResult(**json.loads(line[len(RESULT_MARKER):]))
+
+    if completed.returncode < 0:
+        try:
+            reason = f'was killed by {signal.Signals(-completed.returncode).name}'
+        except ValueError:
+            reason = f'was killed by signal {-completed.returncode}'
+    else:
+        reason = f'exited with status {completed.returncode}'
+    return ProbeResult(error=f'The process importing {entrypoint.module_name} {reason}')
+
@@ -1,9 +1,9 @@
 from .plugin import PluginType
 import inspect
 from xicam.core import msg
-from distributed.protocol.serialize import serialize
 from functools import partial
 import numpy as np
+from types import MappingProxyType
 from typing import Callable, Dict, Type
 from collections import namedtuple
 from typing import List
@@ -106,43 +106,53 @@ class ProcessingPlugin(PluginType):
 
     """
     is_singleton = False
+    needs_qt = False
     hints = []
+    # (name, var, is_input, is_output) for each of the class's variables (including inherited ones), in definition
+    # order; compiled once per class, see `_compile_vars`
+    _var_schema = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compile_vars()
+
+    @classmethod
+    def _compile_vars(cls):
+        """
+        Collects the class's variables (Input, Output and InputOutput class attributes), including those inherited
+        from base classes, so that instances can be built without inspecting the class. Variables added to the class
+        after it's defined need this to be called again.
+
+        """
+        names = dict.fromkeys(name for klass in reversed(cls.__mro__) for name in vars(klass))
+
+        schema = []
+        for name in names:
+            # Resolve each name as attribute lookup would, so that subclasses can override (or remove) variables
+            param = next(vars(klass)[name] for klass in cls.__mro__ if name in vars(klass))
+            if isinstance(param, (Input, Output)):
+                param.name = name
+                schema.append((name, param, isinstance(param, Input), isinstance(param, Output)))
+        cls._var_schema = tuple(schema)
 
     def __new__(cls, *args, **kwargs):
+        # Vars (and hints) are set up before __init__ runs, so that __init__ can use them
         instance = super(ProcessingPlugin, cls).__new__(cls)
-        instance.__init__(*args, **kwargs)
+        state = instance.__dict__
         var_mapping = dict()
-        for name, param in cls.__dict__.items():
-            if isinstance(param, (InOut)):
-                param.name = instance.inverted_vars[param]
-                clone = param.__class__()
-                clone.__dict__ = param.__dict__.copy()
-                clone.parent = instance
-                instance.inputs[param.name] = clone
-                instance.outputs[param.name] = clone
-                setattr(instance, param.name, clone)
-                var_mapping[param] = clone
-            elif isinstance(param, (Output)):
-                param.name = instance.inverted_vars[param]
-                clone = param.__class__()
-                clone.__dict__ = param.__dict__.copy()
-                clone.parent = instance
-                instance.outputs[param.name] = clone
-                setattr(instance, param.name, clone)
-                var_mapping[param] = clone
-            elif isinstance(param, (Input)):
-                param.name = instance.inverted_vars[param]
-                clone = param.__class__()
-                clone.__dict__ = param.__dict__.copy()
-                clone.parent = instance
-                instance.inputs[param.name] = clone
-                setattr(instance, param.name, clone)
-                var_mapping[param] = clone
-
-        instance.hints = []
-        for hint in cls.hints:
-            clone = hint.selective_copy(var_mapping)
-            instance.hints.append(clone)
+        inputs, outputs = {}, {}
+        for name, param, is_input, is_output in cls._var_schema:
+            clone = param._clone(instance)
+            if is_input:
+                inputs[name] = clone
+            if is_output:
+                outputs[name] = clone
+            state[name] = clone
+            var_mapping[param] = clone
+        state['_inputs'] = inputs
+        state['_outputs'] = outputs
+
+        state['hints'] = [hint.selective_copy(var_mapping) for hint in cls.hints] if cls.hints else []
 
         return instance
 
@@ -195,6 +205,71 @@ class ProcessingPlugin(PluginType):
                 self.inputs[k].value = v
         return self._getresult()
 
+    def evaluate_batch(self):
+        """
+        Implements the processing behavior over a batch (see `asfunction_batch`): the batched inputs' values are
+        stacks along a leading axis, and each output's value should be set to a stack along the same axis.
+
+        Plugins that can process a whole stack at once (i.e. with vectorised NumPy operations) override this; other
+        plugins are evaluated item by item instead.
+        """
+        raise NotImplementedError
+
+    @property
+    def evaluates_batches(self) -> bool:
+        """ Whether the plugin processes whole batches itself (by overriding `evaluate_batch`)."""
+        return type(self).evaluate_batch is not ProcessingPlugin.evaluate_batch
+
+    def asfunction_batch(self, **kwargs) -> Dict:
+        """
+        Evaluates a batch of inputs (i.e. the frames of a scan) in one call, then returns the output variables, whose
+        values are stacks of the results along a leading axis.
+
+        Plugins that override `evaluate_batch` get the stacks as they are; others are evaluated on each item in turn,
+        collecting the results into preallocated arrays (or lists, for results that aren't numeric arrays or scalars).
+
+        Parameters
+        ----------
+        kwargs
+            Keywords corresponding to the name of an input variable, and a stack of values for it (i.e. an array,
+            with items along its leading axis); every stack must be the same length. Other inputs keep their values
+            for the whole batch.
+
+        """
+        batch = {self.inputs[k]: v for k, v in kwargs.items() if k in self.inputs}
+        if not batch:
+            raise ValueError('asfunction_batch needs at least one batched input')
+        sizes = {len(stack) for stack in batch.values()}
+        if len(sizes) > 1:
+            raise ValueError(f'Batched inputs must be the same length; got lengths {sorted(sizes)}')
+
+        if self.evaluates_batches:
+            for input, stack in batch.items():
+                input.value = stack
+            self.evaluate_batch()
+        else:
+            self._evaluate_each(batch, sizes.pop())
+        return dict(self.outputs)
+
+    def _evaluate_each(self, batch: Dict, size: int):
+        # The generic batch: evaluate item by item, collecting each output into a container allocated on the first
+        outputs = list(self.outputs.values())
+        inputs = list(batch.items())
+        results = [[] for _ in outputs] if not size else None
+        for i in range(size):
+            for input, stack in inputs:
+                input.value = stack[i]
+            self.evaluate()
+            if results is None:
+                results = [_preallocate(output.value, size) for output in outputs]
+            for j, output in enumerate(outputs):
+                results[j] = _store(results[j], i, output.value)
+
+        for input, stack in batch.items():
+            input.value = stack
+        for output, result in zip(outputs, results):
+            output.value = result
+
     @property
     def inputs(self) -> Dict:
         if not self._inputs:
@@ -210,9 +285,7 @@ class ProcessingPlugin(PluginType):
     @property
     def inverted_vars(self) -> Dict:
         if not self._inverted_vars:
-            self._inverted_vars = {
-                param: name for name, param in self.__class__.__dict__.items() if isinstance(param, (Input, Output))
-            }
+            self._inverted_vars = {param: name for name, param, _, _ in self._var_schema}
         return self._inverted_vars
 
     @property
@@ -271,6 +344,14 @@ class ProcessingPlugin(PluginType):
 
         self._workflow.update()
 
+    def unserializable_inputs(self) -> List[str]:
+        """
+        Returns the names of inputs whose values can't be serialized, which would keep the plugin from being
+        dispatched to a distributed (or multiprocess) executor. Each is also logged with a warning.
+
+        """
+        return [name for name, input in self.inputs.items() if not input.is_serializable()]
+
     @staticmethod
     def getCategory() -> str:
         return "default"
@@ -315,20 +396,33 @@ class _ProcessingPluginRetriever(object):
 
     def __call__(self, pluginname, internaldata):
         from xicam.plugins import manager as pluginmanager
+        from xicam.plugins.pluginmanager import State
 
         # if pluginmanager hasn't collected plugins yet, then do it
-        if not pluginmanager.loadcomplete and not pluginmanager.loading:
-            pluginmanager.collectPlugins()
-
-        # look for the plugin matching the saved name and re-instance it
-        for plugin in pluginmanager.getPluginsOfCategory("ProcessingPlugin"):
-            if plugin.__name__ == pluginname:
-                p = plugin()
-                p.__dict__ = internaldata
-                return p
+        if pluginmanager.state == State.READY and not pluginmanager.get_plugins_of_type("ProcessingPlugin"):
+            pluginmanager.collect_plugins()
+
+        # Entrypoints are usually named after their class, which makes this a constant-time lookup
+        try:
+            plugin = pluginmanager.get_plugin_by_name(pluginname, "ProcessingPlugin")
+        except NameError:
+            plugin = None
+
+        # otherwise, look for the plugin matching the saved name
+        if plugin is None:
+            for candidate in pluginmanager.get_plugins_of_type("ProcessingPlugin"):
+                if candidate.__name__ == pluginname:
+                    plugin = candidate
+                    break
+
+        # re-instance it
+        if plugin is not None:
+            p = plugin()
+            p.__dict__ = internaldata
+            return p
 
         pluginlist = "\n\t".join(
-            [plugin.__name__ for plugin in pluginmanager.getPluginsOfCategory("ProcessingPlugin")]
+            [plugin.__name__ for plugin in pluginmanager.get_plugins_of_type("ProcessingPlugin")]
         )
         raise ValueError(f"No plugin found with name {pluginname} in list of plugins:{pluginlist}")
 
@@ -381,6 +475,57 @@ def EZProcessingPlugin(method: Callable) -> Type[ProcessingPlugin]:
     return type(method.__name__, (ProcessingPlugin,), attrs)
 
 
+# Results of these types are collected into arrays by asfunction_batch
+_STACKABLE_TYPES = (np.ndarray, np.generic, bool, int, float, complex)
+
+
+def _preallocate(value, size):
+    # A container for `size` results like `value`: an array if the results are numeric arrays or scalars, else a list
+    if isinstance(value, _STACKABLE_TYPES):
+        value = np.asarray(value)
+        if not value.dtype.hasobject:
+            return np.empty((size,) + value.shape, dtype=value.dtype)
+    return [None] * size
+
+
+def _store(container, i, value):
+    # Store a result in the container; results that don't fit the array (by shape or dtype) demote it to a list
+    if isinstance(container, np.ndarray):
+        if isinstance(value, _STACKABLE_TYPES):
+            array = np.asarray(value)
+            if array.shape == container.shape[1:] and array.dtype == container.dtype:
+                container[i] = array
+                return container
+        container = list(container)
+    container[i] = value
+    return container
+
+
+# Values of these types can always be serialized
+_SERIALIZABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, np.number, np.bool_)
+
+
+class _Metadata(object):
+    """
+    A variable attribute kept in the variable's metadata, which is shared by every plugin instance's copy of the
+    variable. Setting it gives the variable its own copy of the metadata.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, var, owner=None):
+        if var is None:
+            return self
+        try:
+            return var._meta[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, var, value):
+        var._update_metadata(**{self.name: value})
+
+
 class Var(object):
     whitelist = set()
     """
@@ -397,13 +542,46 @@ class Var(object):
 
     """
 
+    # Only state that differs between plugin instances lives on the variable; the rest (name, description, ...) is
+    # immutable metadata, which the copies of a class-level variable share. Other attributes can still be set (i.e. by
+    # plugins or hints); the __dict__ holding them is only created when one is, and copied to clones
+    __slots__ = ('_meta', '_value', 'workflow', 'parent', '_map_inputs', '_subscriptions', '__weakref__', '__dict__')
+
+    name = _Metadata()
+
     def __init__(self):
-        self.value = None
+        self._meta = MappingProxyType({})
+        self._value = None
         self.workflow = None
         self.parent = None
         self._map_inputs = []  # type: List[List[str, Var]]
         self._subscriptions = []
 
+    def _update_metadata(self, **metadata):
+        # Copy on write; the old metadata may be shared
+        self._meta = MappingProxyType({**self._meta, **metadata})
+
+    def _clone(self, parent):
+        # A copy of this (class-level) variable for an instance of its plugin, without running __init__ again
+        clone = object.__new__(self.__class__)
+        clone._meta = self._meta
+        clone._value = self._value
+        clone.workflow = self.workflow
+        clone.parent = parent
+        clone._map_inputs = []
+        clone._subscriptions = []
+        if self.__dict__:
+            clone.__dict__.update(self.__dict__)
+        return clone
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, v):
+        self._value = v
+
     def connect(self, var):
         # find which variable and connect to it.
         var._map_inputs.append([var.name, self])
@@ -429,6 +607,19 @@ class Var(object):
 class Input(Var):
     whitelist = {'name', 'description', 'default', 'type', 'units', 'min',
                  'max', 'limits', 'fixed', 'fixable', 'visible', 'opts'}
+    # Debugging aid: check that every value assigned is serializable (see `is_serializable`). Off by default, since
+    # checking may serialize (and copy) every value assigned; check before dispatching a workflow instead.
+    validate_values = False
+    __slots__ = ('fixed', '_param')
+
+    description = _Metadata()
+    default = _Metadata()
+    units = _Metadata()
+    _limits = _Metadata()
+    type = _Metadata()
+    fixable = _Metadata()
+    visible = _Metadata()
+    opts = _Metadata()
 
     """
     Defines an input variable.
@@ -478,20 +669,26 @@ class Input(Var):
                  **kwargs):
 
         self.fixed = fixed
+        self._param = None
         super(Input, self).__init__()
-        self.name = name
-        self.description = description
-        self.default = default
-        self.units = units
-        self._limits = limits
-        self.type = type
+        opts = opts or dict()
+        opts.update(kwargs)
+        self._update_metadata(name=name,
+                              description=description,
+                              default=default,
+                              units=units,
+                              _limits=limits if limits is not None else (min, max),
+                              type=type,
+                              fixable=fixable,
+                              visible=visible,
+                              opts=opts)
         self._value = default
-        self.fixable = fixable
-        self.visible = visible
-        self.opts = opts or dict()
-        self.opts.update(kwargs)
-        if limits is None:
-            self._limits = (min, max)
+
+    def _clone(self, parent):
+        clone = super(Input, self)._clone(parent)
+        clone.fixed = self.fixed
+        clone._param = None
+        return clone
 
     @property
     def min(self):
@@ -513,16 +710,27 @@ class Input(Var):
     def limits(self, value):
         self._limits = value
 
-    def __setattr__(self, name, value):
-        if name == "value":
-            try:
-                serialize(value)
-            except:
-                # TODO: narrow except
-                msg.logMessage(f"Value '{value}'on input '{name}' could not be cloudpickled.", level=msg.WARNING)
-            super().__setattr__(name, value)
-        else:
-            super().__setattr__(name, value)
+    def is_serializable(self) -> bool:
+        """
+        Checks whether the current value can be serialized (i.e. to dispatch the plugin to a distributed executor),
+        logging a warning if it can't.
+
+        Values of simple types (numbers, strings and ndarrays without Python objects) always can, so this is cheap for
+        them; anything else is serialized, which may copy a large value.
+        """
+        value = self._value
+        if isinstance(value, _SERIALIZABLE_TYPES) or (type(value) is np.ndarray and not value.dtype.hasobject):
+            return True
+
+        # distributed is a heavy import; defer it until a value actually needs checking
+        from distributed.protocol.serialize import serialize
+
+        try:
+            serialize(value, on_error='raise')
+        except Exception:
+            msg.logMessage(f"Value '{value}' on input '{self.name}' could not be cloudpickled.", level=msg.WARNING)
+            return False
+        return True
 
     @property
     def value(self):
@@ -531,7 +739,9 @@ class Input(Var):
     @value.setter
     def value(self, v):
         self._value = v
-        if hasattr(self, "_param") and self._param:
+        if self.validate_values:
+            self.is_serializable()
+        if self._param:
             self._param.blockSignals(True)
             self._param.setValue(v)
             self._param.blockSignals(False)
@@ -542,6 +752,12 @@ class Input(Var):
 
 class Output(Var):
     whitelist = {'name', 'description', 'type', 'units'}
+    __slots__ = ()
+
+    description = _Metadata()
+    type = _Metadata()
+    units = _Metadata()
+
     """
     Defines an output variable.
 
@@ -560,10 +776,7 @@ class Output(Var):
 
     def __init__(self, name="", description="", type=None, units=None):
         super(Output, self).__init__()
-        self.name = name
-        self.description = description
-        self.units = units
-        self.type = type
+        self._update_metadata(name=name, description=description, units=units, type=type)
 
 
 class InputOutput(Input, Output):
@@ -572,8 +785,9 @@ class InputOutput(Input, Output):
     Represents a variable that acts both as in input and an output.
     """
 
-    pass
+    __slots__ = ()
 
 
 class InOut(InputOutput):
+    __slots__ = ()
     warn("InOut has been renamed; use InputOutput", DeprecationWarning)
@@ -0,0 +1,389 @@
+import os
+import sys
+import glob
+import json
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import entrypoints
+from appdirs import user_cache_dir
+from xicam.core import msg
+
+from .pluginmetadata import sidecar_paths, read_sidecar
+
+# Only entrypoint groups in this namespace are kept in the index
+GROUP_PREFIX = 'xicam.plugins.'
+
+INDEX_VERSION = 2
+
+RECORDS_VERSION = 1
+
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def path_fingerprint(path=None) -> str:
+    """
+    Compute a cheap fingerprint of the distributions visible on `path` (defaults to sys.path).
+
+    Only file system metadata is read (directory mtimes and the mtime/size of each dist-info/egg-info entry_points.txt),
+    so this is much cheaper than parsing every distribution's entrypoints.
+    """
+    if path is None:
+        path = sys.path
+
+    hasher = hashlib.sha1(str(INDEX_VERSION).encode())
+    for folder in path:
+        hasher.update(folder.encode('utf-8', 'surrogateescape'))
+        hasher.update(repr(_stat_key(folder)).encode())
+        if not os.path.isdir(folder):
+            continue
+        egg_info = os.path.join(folder, 'EGG-INFO', 'entry_points.txt')
+        ep_paths = sorted(glob.glob(os.path.join(glob.escape(folder), '*.dist-info', 'entry_points.txt')) +
+                          glob.glob(os.path.join(glob.escape(folder), '*.egg-info', 'entry_points.txt')) +
+                          glob.glob(egg_info))
+        for ep_path in ep_paths:
+            hasher.update(ep_path.encode('utf-8', 'surrogateescape'))
+            hasher.update(repr(_stat_key(ep_path)).encode())
+    return hasher.hexdigest()
+
+
+class EntrypointIndex(object):
+    """
+    A persistent, pre-parsed table of all ``xicam.plugins.*`` entrypoints.
+
+    Scanning every installed distribution for entrypoints is expensive in large environments. The index is stored
+    under the user cache dir and keyed by a fingerprint of the site directories (see `path_fingerprint`); it is only
+    rebuilt when that fingerprint changes. Lookups mirror `entrypoints.get_group_named` and
+    `entrypoints.get_group_all`.
+
+    The index also remembers which site directory each distribution was found in, so that plugin metadata sidecars
+    can be located without importing anything (see `get_metadata`).
+    """
+
+    def __init__(self, cache_path=None, path=None):
+        self.cache_path = cache_path or os.path.join(user_cache_dir(appname="xicam"), 'entrypoints.json')
+        self.path = path
+        self.fingerprint = None
+        self._table = {}  # type: Dict[str, List[List[str]]]  # [name, target, distro name, version, folder]
+        self._group_cache = {}
+
+    def refresh(self, force=False):
+        """
+        Make sure the index reflects the current environment; reads the on-disk index if it is still valid, otherwise
+        rebuilds (and saves) it. If `force`, the index is always rebuilt.
+        """
+        fingerprint = path_fingerprint(self.path)
+        if not force and fingerprint == self.fingerprint:
+            return
+
+        if force or not self._read(fingerprint):
+            self._build()
+            self._write(fingerprint)
+        self.fingerprint = fingerprint
+        self._group_cache = {}
+
+    def invalidate(self):
+        """ Forget the in-memory table; the next access will re-check the environment."""
+        self.fingerprint = None
+        self._table = {}
+        self._group_cache = {}
+
+    def _read(self, fingerprint) -> bool:
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if cached.get('version') != INDEX_VERSION or cached.get('fingerprint') != fingerprint:
+            return False
+
+        self._table = cached['groups']
+        return True
+
+    def _build(self):
+        table = {}
+        # Scan one folder at a time to know where each distribution lives; earlier distributions shadow later ones
+        distros_seen = set()
+        for folder in (sys.path if self.path is None else self.path):
+            for config, distro in entrypoints.iter_files_distros(path=[folder]):
+                if distro.name in distros_seen:
+                    continue
+                distros_seen.add(distro.name)
+                for group in config.sections():
+                    if not group.startswith(GROUP_PREFIX):
+                        continue
+                    for name, epstr in config[group].items():
+                        table.setdefault(group, []).append([name, epstr, distro.name, distro.version, folder])
+        self._table = table
+        msg.logMessage(f'Rebuilt entrypoint index ({sum(map(len, table.values()))} entrypoints)')
+
+    def _write(self, fingerprint):
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': INDEX_VERSION, 'fingerprint': fingerprint, 'groups': self._table}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as ex:
+            # A read-only cache dir is not fatal; the index just won't persist
+            msg.logMessage(f'Unable to save entrypoint index to {self.cache_path}', level=msg.WARNING)
+            msg.logError(ex)
+
+    def _ensure_fresh(self):
+        if self.fingerprint is None:
+            self.refresh()
+
+    def get_group_all(self, group) -> List[entrypoints.EntryPoint]:
+        """
+        Find all entrypoints in a group, including those shadowed by an earlier entrypoint of the same name.
+        """
+        self._ensure_fresh()
+        if group not in self._group_cache:
+            group_all = []
+            for name, epstr, distro_name, distro_version, _ in self._table.get(group, []):
+                distro = entrypoints.Distribution(distro_name, distro_version)
+                with entrypoints.BadEntryPoint.err_to_warnings():
+                    group_all.append(entrypoints.EntryPoint.from_string(epstr, name, distro))
+            self._group_cache[group] = group_all
+        return list(self._group_cache[group])
+
+    def get_group_named(self, group) -> Dict[str, entrypoints.EntryPoint]:
+        """
+        Find a group of entrypoints with unique names; earlier entrypoints shadow later ones.
+        """
+        result = {}
+        for entrypoint in self.get_group_all(group):
+            if entrypoint.name not in result:
+                result[entrypoint.name] = entrypoint
+        return result
+
+    def _find(self, group, name):
+        # The index row of the entrypoint `name` in `group` (the first one, if it's shadowed)
+        self._ensure_fresh()
+        for row in self._table.get(group, []):
+            if row[0] == name:
+                return row
+        return None
+
+    def module_origin(self, group, name) -> Optional[str]:
+        """ Locate the source file of the module that the entrypoint `name` in `group` points to, without importing."""
+        row = self._find(group, name)
+        if row is None:
+            return None
+        module_path = os.path.join(row[4], *row[1].split(':')[0].strip().split('.'))
+        for path in (module_path + '.py', os.path.join(module_path, '__init__.py')):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def get_metadata(self, group, name) -> dict:
+        """
+        Get the sidecar metadata of the entrypoint `name` in `group` (see `pluginmetadata.read_sidecar`), without
+        importing it. Returns an empty dict if there is none.
+        """
+        row = self._find(group, name)
+        if row is not None:
+            for path in sidecar_paths(row[4], row[1].split(':')[0].strip()):
+                metadata = read_sidecar(path)
+                if name in metadata:
+                    return dict(metadata[name])
+        return {}
+
+
+class _EntrypointRecords(object):
+    """
+    Persistent per-entrypoint records that stay valid only while the entrypoint is unchanged.
+
+    Each record is stored with the entrypoint's target, the version of the distribution providing it, the environment
+    fingerprint of `index` (which changes whenever distributions are installed, upgraded or removed), and the
+    mtime/size of a set of source files (i.e. the plugin's module); a record is dropped as soon as any of those differ.
+
+    Changes are saved as they're made, except within a `batch`, which saves them all at once when it ends.
+    """
+
+    filename = None  # Default file name, next to the index
+
+    def __init__(self, index: EntrypointIndex, cache_path=None):
+        self.index = index
+        self.cache_path = cache_path or os.path.join(os.path.dirname(index.cache_path), self.filename)
+        self._records = None  # type: Dict[str, dict]
+        self._lock = threading.RLock()
+        self._batches = 0
+        self._dirty = False
+
+    @staticmethod
+    def _key(type_name, name):
+        return f'{type_name}:{name}'
+
+    @staticmethod
+    def _target(entrypoint):
+        return f'{entrypoint.module_name}:{entrypoint.object_name}'
+
+    @staticmethod
+    def _distro(entrypoint):
+        distro = getattr(entrypoint, 'distro', None)
+        return [distro.name, distro.version] if distro else None
+
+    def _module_origin(self, type_name, entrypoint) -> Optional[str]:
+        return self.index.module_origin(f'{GROUP_PREFIX}{type_name}', entrypoint.name)
+
+    def _environment(self):
+        self.index._ensure_fresh()
+        return self.index.fingerprint
+
+    def _load(self):
+        if self._records is None:
+            try:
+                with open(self.cache_path, 'r') as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = {}
+            self._records = cached.get('records', {}) if cached.get('version') == RECORDS_VERSION else {}
+        return self._records
+
+    def _write(self):
+        tmp_path = f'{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': RECORDS_VERSION, 'records': self._records}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as ex:
+            msg.logMessage(f'Unable to save plugin records to {self.cache_path}', level=msg.WARNING)
+            msg.logError(ex)
+
+    def _changed(self):
+        self._dirty = True
+        if not self._batches:
+            self.flush()
+
+    def flush(self):
+        """ Save any changes not saved yet."""
+        with self._lock:
+            if self._dirty:
+                self._write()
+                self._dirty = False
+
+    @contextmanager
+    def batch(self):
+        """
+        Hold changes made (by any thread) until the end of the block, then save them all at once; i.e. while a whole
+        collection's worth of records are stored, or stale ones dropped. Batches may be nested.
+        """
+        with self._lock:
+            self._batches += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batches -= 1
+                if not self._batches:
+                    self.flush()
+
+    def _lookup(self, type_name, entrypoint) -> Optional[dict]:
+        with self._lock:
+            records = self._load()
+            key = self._key(type_name, entrypoint.name)
+            record = records.get(key)
+            if record is None:
+                return None
+            if (record['target'] == self._target(entrypoint)
+                    and record['distro'] == self._distro(entrypoint)
+                    and record['environment'] == self._environment()
+                    and all(list(_stat_key(path) or ()) == stat for path, stat in record['sources'].items())):
+                return record
+            # Something changed; the record no longer applies
+            del records[key]
+            self._changed()
+        return None
+
+    def _store(self, type_name, entrypoint, sources, **data):
+        record = {'target': self._target(entrypoint),
+                  'distro': self._distro(entrypoint),
+                  'environment': self._environment(),
+                  'sources': {path: list(_stat_key(path) or ()) for path in sources}}
+        record.update(data)
+        with self._lock:
+            self._load()[self._key(type_name, entrypoint.name)] = record
+            self._changed()
+
+    def forget(self, type_name=None, name=None):
+        """
+        Forget the record of the entrypoint `name` of `type_name`. If no `name` is given, forget all records of
+        `type_name` (or all records, if neither is given).
+        """
+        with self._lock:
+            records = self._load()
+            if name is None:
+                keys = [key for key in records if type_name is None or key.startswith(f'{type_name}:')]
+            else:
+                keys = [key for key in [self._key(type_name, name)] if key in records]
+            if not keys:
+                return
+            for key in keys:
+                del records[key]
+            self._changed()
+
+
+class FailureCache(_EntrypointRecords):
+    """
+    A persistent record of plugin entrypoints that failed to load, so that a broken plugin doesn't cost a full (failed)
+    import on every launch.
+
+    A failure is remembered along with every source file involved in the failed import, and is only reported by
+    `check` while none of them (nor the entrypoint or installed distributions) have changed; use `forget` to force a
+    retry.
+    """
+
+    filename = 'failures.json'
+
+    def check(self, type_name, entrypoint) -> Optional[str]:
+        """
+        If loading `entrypoint` failed before, and nothing it depends on has changed since, return the recorded error
+        message; otherwise return None.
+        """
+        failure = self._lookup(type_name, entrypoint)
+        return failure['error'] if failure else None
+
+    def record(self, type_name, entrypoint, exception, sources: List[str] = None):
+        """
+        Remember that loading `entrypoint` failed with `exception` (or an error message). The files involved are the
+        module and those in the exception's traceback, or `sources` if given.
+        """
+        if sources is None:
+            sources = [] if isinstance(exception, str) else \
+                [frame.filename for frame in traceback.extract_tb(exception.__traceback__)]
+        sources = [self._module_origin(type_name, entrypoint)] + list(sources)
+        sources = list(OrderedDict.fromkeys(path for path in sources if path and os.path.isfile(path)))
+        self._store(type_name, entrypoint, sources, error=exception if isinstance(exception, str) else repr(exception))
+
+
+class ProbeCache(_EntrypointRecords):
+    """
+    A persistent record of plugin entrypoints that were imported successfully in a probe subprocess (see
+    `probe.probe_entrypoint`), along with the import time and memory measured there. An entrypoint stays vetted until
+    its module, any module its import loaded from the same package, or the installed distributions change.
+    """
+
+    filename = 'probes.json'
+
+    def check(self, type_name, entrypoint) -> Optional[dict]:
+        """ If `entrypoint` is vetted, return its probe record ({'elapsed': seconds, 'memory': bytes}); else None."""
+        return self._lookup(type_name, entrypoint)
+
+    def record(self, type_name, entrypoint, sources: List[str], elapsed: float, memory: int = None):
+        """ Remember that `entrypoint` imported successfully, loading the files `sources`."""
+        sources = [self._module_origin(type_name, entrypoint)] + list(sources)
+        sources = list(OrderedDict.fromkeys(path for path in sources if path and os.path.isfile(path)))
+        self._store(type_name, entrypoint, sources, elapsed=elapsed, memory=memory)
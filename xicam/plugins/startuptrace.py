@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import threading
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from timeit import default_timer
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes, or None if it can't be measured on this platform.
+    """
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS, and in kilobytes elsewhere
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+
+
+def current_rss():
+    """
+    Return the current resident set size of this process in bytes, or None if it can't be measured on this platform.
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class Span(object):
+    """
+    A timed interval of plugin manager work.
+
+    Attributes
+    ----------
+    name : str
+        What was done (i.e. the plugin name)
+    category : str
+        The kind of work; one of 'discovery', 'scan', 'probe' (an out-of-process import), 'import', 'instantiate',
+        'observer', or 'tick' (one event loop turn of the instantiation pump)
+    start, end : float
+        Timestamps in seconds, relative to the start of the trace
+    thread_id : int
+        Identifier of the thread the work ran on
+    rss_delta : int
+        Growth of the process's peak RSS during the span, in bytes (None if unavailable)
+    traced_delta : int
+        Net bytes allocated (and not freed) during the span, according to tracemalloc; only measured when the trace
+        tracks memory (otherwise None)
+    resident_delta : int
+        Change in the process's current RSS during the span, in bytes; only measured when the trace tracks memory
+    args : dict
+        Extra details, such as the plugin type
+    """
+
+    __slots__ = ('name', 'category', 'start', 'end', 'thread_id', 'rss_delta', 'args', 'traced_delta',
+                 'resident_delta')
+
+    def __init__(self, name, category, start, end, thread_id, rss_delta=None, args=None, traced_delta=None,
+                 resident_delta=None):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = end
+        self.thread_id = thread_id
+        self.rss_delta = rss_delta
+        self.args = args or {}
+        self.traced_delta = traced_delta
+        self.resident_delta = resident_delta
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self):
+        return f'<Span {self.category}:{self.name} {self.duration * 1000:.1f} ms>'
+
+
+class StartupTrace(object):
+    """
+    Collects `Span`s from any thread; use `span` as a context manager around each unit of work. The context manager
+    yields the span's `args` dict, so details only known at the end of the work can be added to it.
+
+    If `track_memory`, tracemalloc is started (if it isn't already) and each span also measures the memory allocated
+    and the change in resident memory during it. Tracing allocations slows Python down noticeably, so this is off by
+    default. Note that memory measured during concurrent spans (i.e. parallel imports) can't be told apart.
+    """
+
+    def __init__(self, track_memory=False):
+        self.origin = default_timer()
+        self._spans = []  # type: List[Span]
+        self._lock = threading.Lock()
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _memory(self):
+        if not self.track_memory:
+            return None, None
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        return traced, current_rss()
+
+    @staticmethod
+    def _delta(start, end):
+        return end - start if start is not None and end is not None else None
+
+    @contextmanager
+    def span(self, name, category, **args):
+        start_rss = peak_rss()
+        start_traced, start_resident = self._memory()
+        start = default_timer()
+        try:
+            yield args
+        finally:
+            end = default_timer()
+            end_traced, end_resident = self._memory()
+            end_rss = peak_rss()
+            span = Span(name, category, start - self.origin, end - self.origin, threading.get_ident(),
+                        self._delta(start_rss, end_rss), args, self._delta(start_traced, end_traced),
+                        self._delta(start_resident, end_resident))
+            with self._lock:
+                self._spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self._spans = []
+        self.origin = default_timer()
+
+    def report(self) -> 'StartupReport':
+        with self._lock:
+            return StartupReport(list(self._spans))
+
+
+class StartupReport(object):
+    """
+    A queryable snapshot of the spans recorded during plugin collection.
+
+    Examples
+    --------
+    Find the slowest plugin imports, then export the full trace to view in chrome://tracing or Perfetto::
+
+        report = manager.startup_report()
+        print(report.slowest(10, category='import'))
+        report.save_chrome_trace('xicam-startup.json')
+    """
+
+    def __init__(self, spans: List[Span]):
+        self.spans = sorted(spans, key=lambda span: span.start)
+
+    def by_category(self, category) -> List[Span]:
+        return [span for span in self.spans if span.category == category]
+
+    def for_plugin(self, name) -> List[Span]:
+        return [span for span in self.spans if span.name == name]
+
+    def slowest(self, n=10, category=None) -> List[Span]:
+        spans = self.by_category(category) if category else self.spans
+        return sorted(spans, key=lambda span: span.duration, reverse=True)[:n]
+
+    def total(self, category=None) -> float:
+        spans = self.by_category(category) if category else self.spans
+        return sum(span.duration for span in spans)
+
+    def plugin_totals(self) -> Dict[str, float]:
+        """ Total import + instantiate time (in seconds) for each plugin."""
+        totals = defaultdict(float)
+        for span in self.spans:
+            if span.category in ('import', 'instantiate'):
+                totals[span.name] += span.duration
+        return dict(totals)
+
+    def plugin_memory(self) -> Dict[str, Dict[str, int]]:
+        """
+        Memory attributed to each plugin's import and instantiation, as
+        ``{name: {'traced': bytes, 'resident': bytes}}``, largest (traced) first. Only available if the trace
+        tracked memory.
+        """
+        totals = {}
+        for span in self.spans:
+            if span.category in ('import', 'instantiate') and span.traced_delta is not None:
+                memory = totals.setdefault(span.name, {'traced': 0, 'resident': 0})
+                memory['traced'] += span.traced_delta
+                memory['resident'] += span.resident_delta or 0
+        return dict(sorted(totals.items(), key=lambda item: item[1]['traced'], reverse=True))
+
+    @property
+    def ticks_per_second(self) -> float:
+        """ Event loop ticks achieved per second by the instantiation pump, while it had work to do."""
+        ticks = self.by_category('tick')
+        if not ticks:
+            return 0
+        elapsed = max(span.end for span in ticks) - ticks[0].start
+        return len(ticks) / elapsed if elapsed else float('inf')
+
+    @property
+    def plugins_per_tick(self) -> float:
+        """ Mean number of plugins instantiated per event loop tick."""
+        ticks = self.by_category('tick')
+        if not ticks:
+            return 0
+        return sum(span.args.get('plugins', 0) for span in ticks) / len(ticks)
+
+    @property
+    def wall_time(self) -> float:
+        if not self.spans:
+            return 0
+        return max(span.end for span in self.spans) - self.spans[0].start
+
+    def to_chrome_trace(self) -> Dict:
+        """ Format the spans as Chrome trace event JSON (also readable by Perfetto)."""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            args = dict(span.args)
+            if span.rss_delta is not None:
+                args['peak_rss_delta_bytes'] = span.rss_delta
+            if span.traced_delta is not None:
+                args['traced_delta_bytes'] = span.traced_delta
+            if span.resident_delta is not None:
+                args['resident_delta_bytes'] = span.resident_delta
+            events.append({'name': span.name,
+                           'cat': span.category,
+                           'ph': 'X',
+                           'ts': span.start * 1e6,
+                           'dur': span.duration * 1e6,
+                           'pid': pid,
+                           'tid': span.thread_id,
+                           'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def __str__(self):
+        lines = [f'Plugin startup: {self.wall_time * 1000:.0f} ms wall time, {len(self.spans)} spans']
+        for category in ('discovery', 'scan', 'probe', 'import', 'instantiate', 'observer'):
+            spans = self.by_category(category)
+            if spans:
+                lines.append(f'  {category}: {len(spans)} spans, {self.total(category) * 1000:.0f} ms total')
+        if self.by_category('tick'):
+            lines.append(f'  instantiation pump: {self.ticks_per_second:.0f} ticks/s, '
+                         f'{self.plugins_per_tick:.1f} plugins/tick')
+        slowest = sorted(self.plugin_totals().items(), key=lambda item: item[1], reverse=True)[:10]
+        if slowest:
+            lines.append('  slowest plugins:')
+            lines.extend(f'    {name}: {duration * 1000:.0f} ms' for name, duration in slowest)
+        heaviest = list(self.plugin_memory().items())[:10]
+        if heaviest:
+            lines.append('  largest plugins:')
+            lines.extend(f"    {name}: {memory['traced'] / 2 ** 20:.1f} MiB allocated, "
+                         f"{memory['resident'] / 2 ** 20:.1f} MiB resident" for name, memory in heaviest)
+        return '\n'.join(lines)
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+class PluginSite(object):
+    """
+    A site directory of plugin modules and installed distributions, and a way to run scripts against it.
+
+    Scripts run in a fresh interpreter (so each starts from a cold import state) with the site on its path. They are
+    formatted with the site's ``site`` and ``cache_path``, plus any other fields given, and print their result as JSON
+    on their last line.
+    """
+
+    PROCESSING_TYPE = {'ProcessingPlugin': 'xicam.plugins.processingplugin:ProcessingPlugin'}
+
+    def __init__(self, tmpdir):
+        self.path = tmpdir.mkdir('site')
+        self.cache_path = str(tmpdir.join('cache.json'))
+
+    def write(self, relative_path, source=''):
+        """Write a file under the site, creating its directories; returns its path."""
+        path = self.path.join(relative_path)
+        path.write(source, ensure=True)
+        return str(path)
+
+    def distribution(self, name, plugins=None, types=None):
+        """
+        Install a distribution declaring plugin types and plugins; returns the path of its entry_points.txt.
+
+        Parameters
+        ----------
+        name : str
+            The distribution's name
+        plugins : dict
+            Entrypoints ({name: 'module:attribute'}) of each plugin type, by type name
+        types : dict
+            Entrypoints of the plugin types the distribution declares
+        """
+        groups = {'PluginType': types} if types else {}
+        groups.update(plugins or {})
+        return self.write(f'{name}-1.0.dist-info/entry_points.txt',
+                          ''.join(f'[xicam.plugins.{group}]\n' +
+                                  ''.join(f'{entry} = {target}\n' for entry, target in entries.items())
+                                  for group, entries in groups.items()))
+
+    def run(self, script, timeout=60, env=None, **fields):
+        """Run a script against the site, returning the JSON it prints last."""
+        env = dict(os.environ, **(env or {}))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(self.path), env.get('PYTHONPATH')]))
+        script = script.format(**{'site': str(self.path), 'cache_path': self.cache_path, **fields})
+        output = subprocess.check_output([sys.executable, '-c', script], env=env, timeout=timeout)
+        return json.loads(output.decode().strip().splitlines()[-1])
+
+
+@pytest.fixture
+def plugin_site(tmpdir):
+    return PluginSite(tmpdir)
@@ -0,0 +1,181 @@
+import sys
+
+
+def test_LazyPluginProxy(tmpdir, monkeypatch):
+    import entrypoints
+    from xicam.plugins.lazyplugin import LazyPluginProxy
+
+    tmpdir.join('lazy_test_plugin.py').write('class SumPlugin(object):\n'
+                                             '    """Adds things up."""\n'
+                                             '    category = "math"\n'
+                                             '    def __init__(self, a=1):\n'
+                                             '        self.a = a\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    loaded = []
+    entrypoint = entrypoints.EntryPoint('Sum', 'lazy_test_plugin', 'SumPlugin')
+    proxy = LazyPluginProxy('ProcessingPlugin', entrypoint, on_load=lambda proxy, cls: loaded.append(cls))
+
+    # Cheap metadata doesn't import the module
+    assert proxy.name == 'Sum'
+    assert proxy.__name__ == 'SumPlugin'
+    assert proxy.__module__ == 'lazy_test_plugin'
+    assert not proxy.is_singleton
+    assert proxy  # truthiness must not trigger a load
+    assert 'lazy_test_plugin' not in sys.modules
+    assert not proxy.loaded
+
+    # Attribute reads, calls, subclassing and isinstance resolve the real class
+    assert proxy.__doc__ == 'Adds things up.'
+    assert proxy.loaded
+    assert proxy.category == 'math'
+    assert loaded == [sys.modules['lazy_test_plugin'].SumPlugin]
+
+    instance = proxy(a=5)
+    assert instance.a == 5
+    assert isinstance(instance, proxy)
+
+    class DerivedPlugin(proxy):
+        pass
+
+    assert issubclass(DerivedPlugin, proxy.load())
+    assert len(loaded) == 1
+
+    sys.modules.pop('lazy_test_plugin', None)
+
+
+def test_LazyPluginProxy_class():
+    import pickle
+    from xicam.plugins import lazyplugin
+    from xicam.plugins.lazyplugin import LazyPluginProxy
+
+    # What proxies resolve from their entrypoint, the class itself keeps as its own
+    assert LazyPluginProxy.__module__ == 'xicam.plugins.lazyplugin'
+    assert LazyPluginProxy.__doc__.strip().startswith('Stands in for a plugin class')
+    assert repr(LazyPluginProxy) == "<class 'xicam.plugins.lazyplugin.LazyPluginProxy'>"
+    assert pickle.loads(pickle.dumps(LazyPluginProxy)) is lazyplugin.LazyPluginProxy
+
+
+def test_LazyPluginTypes(tmpdir, monkeypatch):
+    import entrypoints
+    from xicam.plugins.lazyplugin import LazyPluginTypes
+
+    tmpdir.join('lazy_test_types.py').write('class MathType(object):\n'
+                                            '    priority = 2\n'
+                                            'class QtType(object):\n'
+                                            '    pass\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    loaded = []
+    plugin_types = LazyPluginTypes({'MathType': entrypoints.EntryPoint('MathType', 'lazy_test_types', 'MathType'),
+                                    'QtType': entrypoints.EntryPoint('QtType', 'lazy_test_types', 'QtType')},
+                                   load=lambda name, ep: None if name == 'QtType' else ep.load(),
+                                   on_load=lambda name, cls: loaded.append(name))
+
+    # Registered names are known without importing anything
+    assert sorted(plugin_types) == ['MathType', 'QtType']
+    assert 'MathType' in plugin_types
+    assert 'lazy_test_types' not in sys.modules
+
+    assert plugin_types['MathType'].priority == 2
+    assert plugin_types['MathType'] is sys.modules['lazy_test_types'].MathType
+    assert loaded == ['MathType']
+
+    # Types that can't be used are dropped
+    assert plugin_types.get('QtType') is None
+    assert list(plugin_types) == ['MathType']
+    assert plugin_types.loaded_types() == {'MathType': sys.modules['lazy_test_types'].MathType}
+
+    sys.modules.pop('lazy_test_types', None)
+
+
+LAZY_COLLECTION = """
+import json, sys
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+from xicam.plugins.lazyplugin import LazyPluginProxy
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, lazy_types=['ProcessingPlugin'], track_memory=True)
+manager.collect_plugins()
+proxy = manager.get_plugin_by_name('Increment', 'ProcessingPlugin')
+imports = manager.trace.report().by_category('import')
+result = {{'proxy': type(proxy) is LazyPluginProxy,
+          'module': proxy.__module__,
+          'imported': 'lazy_plugins' in sys.modules}}
+result.update(doc=proxy.__doc__, imported_after_doc='lazy_plugins' in sys.modules)
+plugin = manager.get_plugin_by_name('Increment', 'ProcessingPlugin')
+result.update(swapped=plugin is sys.modules['lazy_plugins'].Increment, result=proxy().evaluate(2))
+result['imports'] = [[span.name, span.args, span.traced_delta > 0]
+                     for span in manager.trace.report().by_category('import')[len(imports):]]
+print(json.dumps(result))
+"""
+
+
+def test_lazy_collection(plugin_site):
+    plugin_site.write('lazy_plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                         'class Increment(ProcessingPlugin):\n'
+                                         '    """Adds one."""\n'
+                                         '    def evaluate(self, a):\n'
+                                         '        return a + 1\n')
+    plugin_site.distribution('lazy_plugins', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {'Increment': 'lazy_plugins:Increment'}})
+
+    # The proxy knows its module without importing it; reading the docstring imports it, and the class replaces it
+    assert plugin_site.run(LAZY_COLLECTION) == {
+        'proxy': True,
+        'module': 'lazy_plugins',
+        'imported': False,
+        'doc': 'Adds one.',
+        'imported_after_doc': True,
+        'swapped': True,
+        'result': 3,
+        # The deferred import is traced (with its memory) like any other
+        'imports': [['Increment', {'type_name': 'ProcessingPlugin', 'lazy': True}, True]]}
+
+
+LAZY_FAILURES = """
+import json, sys
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+from xicam.plugins.lazyplugin import LazyPluginProxy
+
+def collect(**kwargs):
+    sys.modules.pop('broken_plugins', None)
+    manager = XicamPluginManager(index=EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}]), **kwargs)
+    manager.collect_plugins()
+    plugins = manager.type_mapping['ProcessingPlugin']
+    return {{'plugins': {{name: type(plugin) is LazyPluginProxy for name, plugin in sorted(plugins.items())}},
+             'imported': 'broken_plugins' in sys.modules}}
+
+# The failure is recorded by an eager collection, then honoured (or not) by lazy ones
+results = [collect(), collect(lazy_types=['ProcessingPlugin']),
+           collect(lazy_types=['ProcessingPlugin'], retry_failed=True)]
+
+# A failed deferred import is remembered too
+manager = XicamPluginManager(index=EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}]),
+                             lazy_types=['ProcessingPlugin'], retry_failed=True)
+manager.collect_plugins()
+try:
+    manager.get_plugin_by_name('Broken', 'ProcessingPlugin').load()
+except RuntimeError:
+    pass
+results.append(collect(lazy_types=['ProcessingPlugin']))
+print(json.dumps(results))
+"""
+
+
+def test_lazy_cached_failures(plugin_site):
+    plugin_site.write('good_plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                         'class Good(ProcessingPlugin):\n'
+                                         '    pass\n')
+    plugin_site.write('broken_plugins.py', 'raise RuntimeError("broken")\n')
+    plugin_site.distribution('lazy_plugins', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {'Good': 'good_plugins:Good',
+                                                           'Broken': 'broken_plugins:Broken'}})
+    eager, lazy, retried, after_lazy_failure = plugin_site.run(LAZY_FAILURES)
+
+    assert eager == {'plugins': {'Good': False}, 'imported': False}
+    # A lazy type doesn't hand out a proxy for a plugin that's known to be broken...
+    assert lazy == {'plugins': {'Good': True}, 'imported': False}
+    # ...unless failures are retried
+    assert retried == {'plugins': {'Broken': True, 'Good': True}, 'imported': False}
+    assert after_lazy_failure == lazy
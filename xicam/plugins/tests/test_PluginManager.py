@@ -0,0 +1,98 @@
+REPLACING = """
+import json
+from xicam.plugins import XicamPluginManager, EntrypointIndex, Filters, ProcessingPlugin
+
+class First(ProcessingPlugin):
+    pass
+
+class Second(ProcessingPlugin):
+    pass
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index)
+manager.collect_plugins()
+batched, single = [], []
+manager.attach(lambda c: batched.append([c.added, c.replaced, c.removed]), Filters.UPDATE, with_changes=True)
+manager.attach(lambda c: single.append([c.added, c.replaced, c.removed]), Filters.UPDATE, with_changes=True,
+               coalesce=False)
+manager.collect_plugin('Live', First, 'ProcessingPlugin')
+manager.collect_plugin('Live', Second, 'ProcessingPlugin', replace=True)
+# Replacing a plugin that was never collected just adds it
+manager.collect_plugin('New', Second, 'ProcessingPlugin', replace=True)
+print(json.dumps({{'batched': batched, 'single': single,
+                  'collected': manager.get_plugin_by_name('Live', 'ProcessingPlugin').__name__}}))
+"""
+
+
+def test_replace_plugin(plugin_site):
+    plugin_site.distribution('types', types=plugin_site.PROCESSING_TYPE)
+
+    # Observers are told the plugin was replaced, not added, whether they coalesce changes or not
+    expected = [[{'ProcessingPlugin': ['Live']}, {}, {}],
+                [{}, {'ProcessingPlugin': ['Live']}, {}],
+                [{'ProcessingPlugin': ['New']}, {}, {}]]
+    assert plugin_site.run(REPLACING) == {'batched': expected, 'single': expected, 'collected': 'Second'}
+
+
+UNLOADING = """
+import json, sys
+from xicam.plugins import XicamPluginManager, EntrypointIndex, State, Filters
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index)
+manager.collect_plugins()
+removed = []
+manager.attach(lambda c: removed.extend(c.removed.get('ProcessingPlugin', [])), Filters.UPDATE, with_changes=True,
+               coalesce=False)
+
+unloaded = manager.unload_plugin('Unloaded', 'ProcessingPlugin')
+result = {{'unloaded': unloaded,
+          'removed': list(removed),
+          'modules': sorted(name for name in sys.modules if name.startswith('unload_pkg')),
+          'plugins': sorted(manager.type_mapping['ProcessingPlugin'])}}
+try:
+    manager.unload_plugin('Unloaded', 'ProcessingPlugin')
+except NameError:
+    result['unknown'] = True
+
+# Plugins are only unloaded between collections
+manager.state = State.LOADING
+try:
+    manager.unload_plugin('Kept', 'ProcessingPlugin')
+except RuntimeError:
+    result['guarded'] = 'Kept' in manager.type_mapping['ProcessingPlugin']
+manager.state = State.READY
+
+# The unloaded plugin is discovered again when re-collecting
+manager.collect_plugins()
+result['recollected'] = sorted(manager.type_mapping['ProcessingPlugin'])
+result['reimported'] = 'unload_pkg.private' in sys.modules
+print(json.dumps(result))
+"""
+
+
+def test_unload_plugin(plugin_site):
+    plugin_site.write('unload_pkg/__init__.py')
+    plugin_site.write('unload_pkg/shared.py', 'VALUE = 1\n')
+    plugin_site.write('unload_pkg/private.py', 'VALUE = 2\n')
+    plugin_site.write('unload_pkg/unloaded.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                                'from unload_pkg import private, shared\n'
+                                                'class Unloaded(ProcessingPlugin):\n'
+                                                '    pass\n')
+    plugin_site.write('unload_pkg/kept.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                            'from unload_pkg import shared\n'
+                                            'class Kept(ProcessingPlugin):\n'
+                                            '    pass\n')
+    plugin_site.distribution('unload_pkg', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {'Unloaded': 'unload_pkg.unloaded:Unloaded',
+                                                           'Kept': 'unload_pkg.kept:Kept'}})
+
+    # Only the modules the unloaded plugin doesn't share with another plugin are removed
+    assert plugin_site.run(UNLOADING) == {'unloaded': ['unload_pkg.private', 'unload_pkg.unloaded'],
+                                          'removed': ['Unloaded'],
+                                          'modules': ['unload_pkg', 'unload_pkg.kept', 'unload_pkg.shared'],
+                                          'plugins': ['Kept'],
+                                          'unknown': True,
+                                          'guarded': True,
+                                          'recollected': ['Kept', 'Unloaded'],
+                                          'reimported': True}
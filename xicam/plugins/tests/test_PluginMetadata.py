@@ -0,0 +1,136 @@
+import json
+import sys
+
+
+def test_sidecar_metadata(tmpdir):
+    from xicam.plugins.startupcache import EntrypointIndex
+
+    site_dir = tmpdir.mkdir('site')
+    package = site_dir.mkdir('sidecar_plugins')
+    package.join('__init__.py').write('raise ImportError("metadata must be read without importing")\n')
+    package.join('filters.py').write('')
+    package.join('filters.xicam-plugin').write(json.dumps({'Gaussian': {'category': 'Filters',
+                                                                        'icon': 'icons/gaussian.png',
+                                                                        'inputs': ['image', 'sigma'],
+                                                                        'outputs': ['image'],
+                                                                        'shortcut': 'G'}}))
+    dist_info = site_dir.mkdir('sidecar_plugins-1.0.dist-info')
+    dist_info.join('entry_points.txt').write('[xicam.plugins.ProcessingPlugin]\n'
+                                             'Gaussian = sidecar_plugins.filters:Gaussian\n'
+                                             'Median = sidecar_plugins.filters:Median\n')
+
+    index = EntrypointIndex(cache_path=str(tmpdir.join('entrypoints.json')), path=[str(site_dir)])
+    metadata = index.get_metadata('xicam.plugins.ProcessingPlugin', 'Gaussian')
+    assert metadata['category'] == 'Filters'
+    assert metadata['inputs'] == ['image', 'sigma']
+    assert index.get_metadata('xicam.plugins.ProcessingPlugin', 'Median') == {}
+    assert 'sidecar_plugins' not in sys.modules
+
+
+def test_PluginMetadata_from_class():
+    from xicam.plugins import ProcessingPlugin, Input, Output, InputOutput
+    from xicam.plugins.pluginmetadata import PluginMetadata
+
+    class Threshold(ProcessingPlugin):
+        """
+        Mask pixels below a threshold.
+
+        More details that aren't part of the short description.
+        """
+        category = 'Masking'
+        image = InputOutput()
+        threshold = Input(default=0)
+        mask = Output()
+
+    metadata = PluginMetadata.from_class('Threshold', 'ProcessingPlugin', Threshold)
+    assert metadata.description == 'Mask pixels below a threshold.'
+    assert metadata.category == 'Masking'
+    assert metadata.inputs == ['image', 'threshold']
+    assert metadata.outputs == ['image', 'mask']
+    assert not metadata.is_singleton
+
+    # Sidecar metadata takes precedence; the class only fills in the gaps
+    sidecar = PluginMetadata('Threshold', 'ProcessingPlugin', category='Segmentation', shortcut='T')
+    sidecar.update(metadata)
+    assert sidecar.category == 'Segmentation'
+    assert sidecar.inputs == ['image', 'threshold']
+    assert sidecar.to_dict()['shortcut'] == 'T'
+
+    # Variables removed by a subclass aren't described, just as its instances don't get them
+    class Unmasked(Threshold):
+        mask = None
+
+    metadata = PluginMetadata.from_class('Unmasked', 'ProcessingPlugin', Unmasked)
+    assert metadata.inputs == ['image', 'threshold']
+    assert metadata.outputs == ['image'] == list(Unmasked().outputs)
+
+
+def test_PluginMetadata_category():
+    from xicam.plugins import ProcessingPlugin
+    from xicam.plugins.pluginmetadata import PluginMetadata
+
+    class Smooth(ProcessingPlugin):
+        @staticmethod
+        def getCategory():
+            return 'Filters'
+
+    class Unsorted(ProcessingPlugin):
+        def getCategory(self):
+            return 'Instance only'
+
+    # Without a category attribute, getCategory() is asked (where it can be called on the class)
+    assert PluginMetadata.from_class('Smooth', 'ProcessingPlugin', Smooth).category == 'Filters'
+    assert PluginMetadata.from_class('Plain', 'ProcessingPlugin', ProcessingPlugin).category == 'default'
+    assert PluginMetadata.from_class('Unsorted', 'ProcessingPlugin', Unsorted).category is None
+
+
+DESCRIBE = """
+import json, sys
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, lazy_types=['ProcessingPlugin'])
+manager.collect_plugins()
+
+def describe():
+    return {{metadata.name: {{field: getattr(metadata, field)
+                             for field in ('category', 'description', 'module_name', 'inputs', 'outputs')}}
+            for metadata in manager.describe_plugins('ProcessingPlugin')}}
+
+before = describe()
+imported = 'described_plugins' in sys.modules
+manager.get_plugin_by_name('Smooth', 'ProcessingPlugin').load()
+manager.get_plugin_by_name('Plain', 'ProcessingPlugin').load()
+print(json.dumps({{'before': before, 'imported': imported, 'after': describe(),
+                  'one': manager.describe('Smooth').description}}))
+"""
+
+
+def test_describe_plugins(plugin_site):
+    plugin_site.write('described_plugins.py', 'from xicam.plugins import ProcessingPlugin, Input, Output\n'
+                                              'class Smooth(ProcessingPlugin):\n'
+                                              '    """Smooth an image."""\n'
+                                              '    image = Input()\n'
+                                              '    smoothed = Output()\n'
+                                              'class Plain(ProcessingPlugin):\n'
+                                              '    pass\n')
+    plugin_site.write('described_plugins.xicam-plugin', json.dumps({'Smooth': {'category': 'Filters'}}))
+    plugin_site.distribution('described_plugins', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {'Smooth': 'described_plugins:Smooth',
+                                                           'Plain': 'described_plugins:Plain'}})
+    result = plugin_site.run(DESCRIBE)
+
+    # Before anything is imported, only the sidecar and entrypoint are described
+    assert not result['imported']
+    assert result['before'] == {
+        'Smooth': {'category': 'Filters', 'description': None, 'module_name': 'described_plugins', 'inputs': [],
+                   'outputs': []},
+        'Plain': {'category': None, 'description': None, 'module_name': 'described_plugins', 'inputs': [],
+                  'outputs': []}}
+    # Once imported, the classes fill in the rest; the sidecar still takes precedence
+    assert result['after'] == {
+        'Smooth': {'category': 'Filters', 'description': 'Smooth an image.', 'module_name': 'described_plugins',
+                   'inputs': ['image'], 'outputs': ['smoothed']},
+        'Plain': {'category': 'default', 'description': None, 'module_name': 'described_plugins', 'inputs': [],
+                  'outputs': []}}
+    assert result['one'] == 'Smooth an image.'
@@ -0,0 +1,153 @@
+import threading
+import time
+
+
+def test_PluginRegistry():
+    from xicam.plugins.pluginregistry import PluginRegistry
+
+    registry = PluginRegistry(['ProcessingPlugin', 'GUIPlugin'])
+    registry.set('ProcessingPlugin', 'Sum', 'sum')
+    registry.update('ProcessingPlugin', {'Mean': 'mean', 'Shared': 'processing'})
+    registry.set('GUIPlugin', 'Shared', 'gui')
+
+    snapshot = registry['ProcessingPlugin']
+    assert dict(snapshot) == {'Sum': 'sum', 'Mean': 'mean', 'Shared': 'processing'}
+    assert registry['ProcessingPlugin'] is snapshot  # reused until the next write
+    assert registry.lookup('ProcessingPlugin', 'Mean') == 'mean'
+    assert registry.lookup('Unknown', 'Mean') is None
+    assert registry.matches('Shared') == {'ProcessingPlugin': 'processing', 'GUIPlugin': 'gui'}
+    assert registry.count() == 4
+
+    # Snapshots that have been handed out never change
+    assert registry.pop('ProcessingPlugin', 'Sum') == 'sum'
+    assert not registry.swap('ProcessingPlugin', 'Mean', 'median', 'mode')
+    assert registry.swap('ProcessingPlugin', 'Mean', 'mean', 'median')
+    assert 'Sum' in snapshot and snapshot['Mean'] == 'mean'
+    assert dict(registry['ProcessingPlugin']) == {'Mean': 'median', 'Shared': 'processing'}
+    try:
+        snapshot['Sum'] = 'sum'
+    except TypeError:
+        pass
+    else:
+        assert False, 'snapshots must be read-only'
+
+    registry.clear()
+    assert sorted(registry) == ['GUIPlugin', 'ProcessingPlugin'] and registry.count() == 0
+    assert registry.matches('Shared') == {}
+
+
+def test_PluginRegistry_matches():
+    from xicam.plugins.pluginregistry import PluginRegistry
+
+    registry = PluginRegistry(['ProcessingPlugin', 'GUIPlugin'])
+    registry.set('ProcessingPlugin', 'Shared', 'processing')
+    assert registry.setdefault('GUIPlugin', 'Shared', 'gui') == 'gui'
+    matches = registry.matches('Shared')
+    assert matches == {'ProcessingPlugin': 'processing', 'GUIPlugin': 'gui'}
+
+    # The index follows every write, and matches that have been handed out never change
+    assert registry.swap('GUIPlugin', 'Shared', 'gui', 'other gui')
+    assert registry.matches('Shared') == {'ProcessingPlugin': 'processing', 'GUIPlugin': 'other gui'}
+    registry.pop('ProcessingPlugin', 'Shared')
+    assert registry.matches('Shared') == {'GUIPlugin': 'other gui'}
+    registry.pop('GUIPlugin', 'Shared')
+    assert registry.matches('Shared') == {} and registry.matches('Missing') == {}
+    assert matches == {'ProcessingPlugin': 'processing', 'GUIPlugin': 'gui'}
+    try:
+        matches['GUIPlugin'] = 'gui'
+    except TypeError:
+        pass
+    else:
+        assert False, 'matches must be read-only'
+
+
+def test_PluginRegistry_concurrent_reads():
+    from xicam.plugins.pluginregistry import PluginRegistry
+
+    registry = PluginRegistry(['ProcessingPlugin'])
+    done = threading.Event()
+    errors = []
+
+    def read():
+        try:
+            while not done.is_set():
+                # Every snapshot is internally consistent: a name is registered with its own value
+                for name, value in registry['ProcessingPlugin'].items():
+                    assert value == name.lower()
+                for value in registry.matches('P0').values():
+                    assert value == 'p0'
+                registry.count()
+                time.sleep(0)  # let the writer in
+        except Exception as ex:
+            errors.append(ex)
+
+    readers = [threading.Thread(target=read) for _ in range(32)]
+    for reader in readers:
+        reader.start()
+    for i in range(2000):
+        registry.set('ProcessingPlugin', f'P{i}', f'p{i}')
+        if i % 3 == 0:
+            registry.pop('ProcessingPlugin', f'P{i // 2}')
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert not errors
+    assert registry.count() == len(registry['ProcessingPlugin'])
+
+
+CONCURRENT_LOOKUPS = """
+import json, sys, threading, time
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+
+sys.setswitchinterval(1e-5)  # switch threads often, so reads interleave with writes
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, load_workers=4)
+collected = threading.Event()
+errors, lookups = [], [0]
+
+def lookup(seed):
+    try:
+        i = seed
+        while not collected.is_set():
+            i = (i + 7) % {count}
+            for name, plugin in manager.type_mapping['ProcessingPlugin'].items():
+                assert plugin.__name__ == name
+            assert len(manager.get_plugins_of_type('ProcessingPlugin')) <= {count}
+            try:
+                plugin = manager.get_plugin_by_name(f'P{{i}}', 'ProcessingPlugin')
+            except NameError:
+                plugin = None  # not discovered yet
+            assert plugin is None or plugin.__name__ == f'P{{i}}'
+            manager.describe_plugins('ProcessingPlugin')
+            lookups[0] += 1
+            time.sleep(0)
+    except Exception as ex:
+        errors.append(repr(ex))
+
+threads = [threading.Thread(target=lookup, args=(seed,)) for seed in range(32)]
+for thread in threads:
+    thread.start()
+manager.collect_plugins()
+collected.set()
+for thread in threads:
+    thread.join()
+print(json.dumps({{'errors': errors, 'lookups': lookups[0],
+                  'collected': len(manager.type_mapping['ProcessingPlugin'])}}))
+"""
+
+
+def test_concurrent_lookups(plugin_site):
+    count = 200
+    for module in range(4):
+        plugin_site.write(f'many_plugins{module}.py', 'from xicam.plugins import ProcessingPlugin\n' +
+                          ''.join(f'class P{i}(ProcessingPlugin):\n    pass\n' for i in range(module, count, 4)))
+    plugin_site.distribution('many_plugins', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {f'P{i}': f'many_plugins{i % 4}:P{i}' for i in range(count)}})
+    result = plugin_site.run(CONCURRENT_LOOKUPS, count=count)
+
+    # 32 threads read the registry throughout collection without tripping over its writes
+    assert result['errors'] == []
+    assert result['lookups'] > 0
+    assert result['collected'] == count
@@ -0,0 +1,52 @@
+import entrypoints
+
+
+def make_items(count, type_name='ProcessingPlugin'):
+    return [(type_name, entrypoints.EntryPoint(f'{type_name}{i}', 'module', 'object')) for i in range(count)]
+
+
+def test_PluginScheduler():
+    from xicam.plugins.pluginscheduler import PluginScheduler
+
+    priorities = {}
+    scheduler = PluginScheduler(lambda type_name, name: (priorities.get(name, 0),))
+
+    items = make_items(5)
+    for item in items:
+        scheduler.put(item)
+
+    # Ties come out in the order they were queued
+    assert scheduler.get() is items[0]
+
+    # Re-ranking jumps the queue
+    priorities['ProcessingPlugin3'] = 1
+    scheduler.reprioritize()
+    assert scheduler.get() is items[3]
+    assert [scheduler.get() for _ in range(3)] == [items[1], items[2], items[4]]
+    assert scheduler.empty()
+
+
+def drain_order(scheduler):
+    order = []
+    while not scheduler.empty():
+        order.append(scheduler.get()[1].name)
+    return order
+
+
+def test_PluginScheduler_default_perspective():
+    from xicam.plugins.pluginscheduler import PluginScheduler
+
+    priorities = {}
+    scheduler = PluginScheduler(lambda type_name, name: (priorities.get(name, 0),))
+    plugins, perspective = make_items(300), make_items(1, 'GUIPlugin')
+    for item in plugins + perspective:
+        scheduler.put(item)
+
+    # Without priorities, the default perspective waits behind every plugin queued before it
+    assert scheduler.get() is plugins[0]
+    assert scheduler.qsize() == 300
+
+    # Raising its priority while queued brings it up next, and leaves the rest in queueing order
+    priorities['GUIPlugin0'] = 10
+    scheduler.reprioritize()
+    assert drain_order(scheduler) == ['GUIPlugin0'] + [entrypoint.name for _, entrypoint in plugins[1:]]
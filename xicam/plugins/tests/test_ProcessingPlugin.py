@@ -42,3 +42,140 @@ def test_EZProcessingPlugin():
 
     ArrayRotate = EZProcessingPlugin(np.rot90)
     assert ArrayRotate()
+
+
+def test_inherited_vars():
+    from xicam.plugins import ProcessingPlugin, Input, Output, InputOutput
+
+    class Base(ProcessingPlugin):
+        data = Input(type=float)
+        mask = InputOutput()
+        result = Output()
+
+    class Threshold(Base):
+        minimum = Input(default=0.0)
+        result = None  # Subclasses can remove variables...
+        data = Input(default=1.0)  # ...or override them
+        masked = Output()
+
+    t1 = Threshold()
+    t2 = Threshold()
+    assert list(t1.inputs) == ["data", "mask", "minimum"]
+    assert list(t1.outputs) == ["mask", "masked"]
+    assert t1.inputs["data"].default == 1.0
+    assert t1.inputs["mask"] is t1.outputs["mask"] is t1.mask
+    assert t1.mask.parent is t1 and t1.mask is not t2.mask
+    t1.masked.connect(t2.mask)
+    assert not t1.mask._map_inputs and len(t2.mask._map_inputs) == 1
+    assert list(Base().inputs) == ["data", "mask"]
+
+
+def test_shared_var_metadata():
+    from xicam.plugins import ProcessingPlugin, Input, Output
+
+    class Scale(ProcessingPlugin):
+        factor = Input(description="Scale factor", default=2.0, units="nm", limits=(1, 10))
+        scaled = Output(description="Scaled data")
+
+    t1 = Scale()
+    t2 = Scale()
+    assert t1.factor._meta is t2.factor._meta is Scale.factor._meta
+    assert (t1.factor.name, t1.factor.units, t1.factor.limits) == ("factor", "nm", (1, 10))
+
+    # Other attributes can still be set on variables; those set on the class's variable are copied to instances
+    t1.factor.widget = "spinbox"
+    assert not hasattr(t2.factor, "widget")
+    Scale.scaled.plot = True
+    assert Scale().scaled.plot and not hasattr(t1.scaled, "plot")
+
+    # Values and metadata changes belong to one instance
+    t1.factor.value = 3.0
+    t1.factor.description = "Changed"
+    assert t2.factor.value == 2.0 and t2.factor.description == "Scale factor"
+    assert Scale().factor.description == "Scale factor"
+    t1.scaled.value = 6.0
+    assert t2.scaled.value is None
+
+
+def test_asfunction_batch():
+    import numpy as np
+    from xicam.plugins import ProcessingPlugin, Input, Output
+
+    class Normalize(ProcessingPlugin):
+        frame = Input(type=np.ndarray)
+        scale = Input(default=2.0)
+        normalized = Output()
+        total = Output()
+        label = Output()
+
+        def evaluate(self):
+            self.normalized.value = self.frame.value / self.frame.value.sum() * self.scale.value
+            self.total.value = self.frame.value.sum()
+            self.label.value = f"total {self.total.value:g}"
+
+    class BatchNormalize(Normalize):
+        def evaluate_batch(self):
+            totals = self.frame.value.sum(axis=(1, 2))
+            self.normalized.value = self.frame.value / totals[:, None, None] * self.scale.value
+            self.total.value = totals
+            self.label.value = [f"total {total:g}" for total in totals]
+
+    frames = np.arange(1, 5 * 4 * 3 + 1, dtype=float).reshape(5, 4, 3)
+    expected = [Normalize().asfunction(frame=frame) for frame in frames]
+
+    assert not Normalize().evaluates_batches and BatchNormalize().evaluates_batches
+    for plugin in [Normalize(), BatchNormalize()]:
+        outputs = plugin.asfunction_batch(frame=frames)
+        assert isinstance(outputs["normalized"].value, np.ndarray) and outputs["normalized"].value.shape == (5, 4, 3)
+        assert np.allclose(outputs["normalized"].value, [result["normalized"].value for result in expected])
+        assert np.allclose(outputs["total"].value, [result["total"].value for result in expected])
+        assert list(outputs["label"].value) == [result["label"].value for result in expected]
+        assert plugin.frame.value is frames and plugin.scale.value == 2.0
+
+    # Results that don't stack are collected into a list
+    class Crop(ProcessingPlugin):
+        frame = Input()
+        cropped = Output()
+
+        def evaluate(self):
+            self.cropped.value = self.frame.value[: int(self.frame.value[0, 0])]
+
+    cropped = Crop().asfunction_batch(frame=frames)["cropped"].value
+    assert [len(crop) for crop in cropped] == [1, 4, 4, 4, 4]
+
+    with pytest.raises(ValueError):
+        Normalize().asfunction_batch(frame=frames, scale=[1.0, 2.0])
+
+
+def test_unserializable_inputs(monkeypatch):
+    import threading
+    import numpy as np
+    from xicam.core import msg
+    from xicam.plugins import ProcessingPlugin, Input
+
+    class Threshold(ProcessingPlugin):
+        image = Input(type=np.ndarray)
+        threshold = Input(default=0.5, type=float)
+        callback = Input()
+
+    plugin = Threshold()
+    plugin.image.value = np.zeros((4, 4))
+    plugin.callback.value = lambda: None  # Serializable with cloudpickle
+    assert plugin.unserializable_inputs() == []
+
+    warnings = []
+    monkeypatch.setattr(msg, 'logMessage',
+                        lambda *args, level=None, **kwargs: warnings.append(args[0]) if level == msg.WARNING else None)
+
+    # Assigning a value doesn't check it...
+    plugin.callback.value = threading.Lock()
+    assert warnings == []
+    assert plugin.unserializable_inputs() == ['callback']
+    assert len(warnings) == 1 and "input 'callback'" in warnings[0]
+
+    # ...unless checking on every assignment is turned on, as a debugging aid
+    monkeypatch.setattr(Input, 'validate_values', True)
+    plugin.threshold.value = 0.75
+    assert plugin.threshold.value == 0.75 and len(warnings) == 1
+    plugin.callback.value = threading.RLock()
+    assert len(warnings) == 2 and "input 'callback'" in warnings[1]
@@ -0,0 +1,271 @@
+"""
+Synthetic-scale benchmarks for plugin collection.
+
+Each benchmark generates a site directory of synthetic plugin distributions (spread across the ten plugin types) and
+collects them with a `XicamPluginManager` in a fresh interpreter, running the Qt event loop on an offscreen platform.
+The suite checks that collection scales (roughly) linearly with the number of entrypoints, and that giving the default
+perspective a priority (`plugin_priorities`) brings it up sooner. What the manager does per entrypoint (imports,
+reloads, event loop hops) is always checked, at small sizes. Timings depend on the machine and what else it's running,
+so they are only checked when XICAM_BENCHMARKS is set, or when sizes are given in XICAM_BENCHMARK_SIZES (i.e.
+``XICAM_BENCHMARK_SIZES=100,1000,5000``). Or run this module directly::
+
+    python -m xicam.plugins.tests.test_benchmarks 100 1000 5000
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+PLUGIN_TYPES = ['CatalogPlugin', 'ControllerPlugin', 'DataHandlerPlugin', 'DataResourcePlugin', 'EZPlugin',
+                'Fittable1DModelPlugin', 'GUIPlugin', 'ProcessingPlugin', 'SettingsPlugin', 'QWidgetPlugin']
+SINGLETON_TYPES = ['GUIPlugin', 'SettingsPlugin']
+PLUGINS_PER_DISTRIBUTION = 50
+
+DEFAULT_SIZES = (100, 1000)
+# Sizes for the (always on) per-entrypoint counts; spans more than one distribution
+COUNT_SIZES = (20, 120)
+
+# How much more each entrypoint may cost at larger sizes than at the smallest size, before it counts as a regression
+SCALING_TOLERANCE = 4
+# Seconds of noise allowed on top of that
+SCALING_SLACK = 0.05
+
+BENCHMARK = """
+import json, os, sys, time
+from qtpy.QtCore import QEventLoop
+from qtpy.QtWidgets import QApplication
+
+app = QApplication([])
+from xicam.plugins import XicamPluginManager, EntrypointIndex, State
+from xicam.plugins.startuptrace import peak_rss
+
+config = json.loads(sys.argv[1])
+baseline_rss = peak_rss()
+index = EntrypointIndex(cache_path=config['cache_path'], path=[config['site']])
+manager = XicamPluginManager(index=index, headless=False, load_workers=config['load_workers'])
+results = {}
+
+start = time.perf_counter()
+manager._discover_plugins()
+results['discover'] = time.perf_counter() - start
+
+lookup_start = time.perf_counter()
+manager._load_plugins()
+results['load_start'] = time.perf_counter() - lookup_start
+
+# Ask for the last plugin while collection has just begun (this spins the event loop until it's collected)
+name, type_name = config['lookup']
+assert manager.get_plugin_by_name(name, type_name, timeout=600) is not None
+results['lookup'] = time.perf_counter() - lookup_start
+
+while manager.state != State.READY:
+    app.processEvents(QEventLoop.AllEvents, 50)
+results['collect'] = time.perf_counter() - start
+
+report = manager.startup_report()
+imports, ticks = report.by_category('import'), report.by_category('tick')
+results['load'] = max(span.end for span in imports) - min(span.start for span in imports)
+results['pump'] = report.total('tick')
+results['event_loop_hops'] = len(ticks)
+results['imported'] = len({span.name for span in imports})
+results['collected'] = manager.type_mapping.count()
+
+# Change one module, and reload incrementally
+with open(config['edit'], 'a') as f:
+    f.write('# edited\\n')
+start = time.perf_counter()
+changes = manager.hot_reload(incremental=True)
+results['hot_reload'] = time.perf_counter() - start
+results['reloaded'] = sum(map(len, changes.replaced.values()))
+
+peak = peak_rss()
+results['peak_memory'] = peak - baseline_rss if peak and baseline_rss else None
+print(json.dumps(results))
+"""
+
+TIMINGS = ['discover', 'lookup', 'load', 'pump', 'collect', 'hot_reload']
+
+PERSPECTIVE = """
+import json, sys
+from qtpy.QtCore import QEventLoop
+from qtpy.QtWidgets import QApplication
+
+app = QApplication([])
+from xicam.plugins import XicamPluginManager, EntrypointIndex, State
+
+config = json.loads(sys.argv[1])
+index = EntrypointIndex(cache_path=config['cache_path'], path=[config['site']])
+manager = XicamPluginManager(index=index, headless=False, plugin_priorities=config['plugin_priorities'])
+manager.collect_plugins()
+while manager.state != State.READY:
+    app.processEvents(QEventLoop.AllEvents, 50)
+
+# From the start of discovery until the perspective is instantiated
+report = manager.startup_report()
+start = min(span.start for span in report.by_category('discovery'))
+end, = [span.end for span in report.by_category('instantiate') if span.name == config['perspective']]
+print(json.dumps({'time_to_perspective': end - start}))
+"""
+
+benchmark = pytest.mark.skipif(not (os.environ.get('XICAM_BENCHMARKS') or os.environ.get('XICAM_BENCHMARK_SIZES')),
+                               reason='timing benchmark; set XICAM_BENCHMARKS=1 or XICAM_BENCHMARK_SIZES to run')
+
+
+def make_site(site, count):
+    """
+    Write `count` synthetic plugin entrypoints (round robin across the plugin types) into the site directory `site`,
+    in distributions of `PLUGINS_PER_DISTRIBUTION`. Returns the (name, type_name) of the last plugin.
+    """
+    # Stand-ins for the plugin types, so that the benchmark measures the manager rather than the types' dependencies
+    os.makedirs(site, exist_ok=True)
+    with open(os.path.join(site, 'bench_types.py'), 'w') as f:
+        f.write('class BenchType(object):\n'
+                '    is_singleton = False\n'
+                '    needs_qt = False\n')
+        for type_name in PLUGIN_TYPES:
+            f.write(f'class {type_name}(BenchType):\n'
+                    f'    is_singleton = {type_name in SINGLETON_TYPES}\n')
+    _write_distribution(site, 'bench_types', {'PluginType': {type_name: f'bench_types:{type_name}'
+                                                             for type_name in PLUGIN_TYPES}})
+
+    for first in range(0, count, PLUGINS_PER_DISTRIBUTION):
+        package = f'bench_plugins{first // PLUGINS_PER_DISTRIBUTION}'
+        os.makedirs(os.path.join(site, package))
+        open(os.path.join(site, package, '__init__.py'), 'w').close()
+
+        groups = {}
+        with open(os.path.join(site, package, 'plugins.py'), 'w') as f:
+            f.write('import bench_types\n')
+            for i in range(first, min(first + PLUGINS_PER_DISTRIBUTION, count)):
+                type_name = PLUGIN_TYPES[i % len(PLUGIN_TYPES)]
+                f.write(f'class Bench{i}(bench_types.{type_name}):\n'
+                        f'    def __init__(self):\n'
+                        f'        self.data = list(range(100))\n')
+                groups.setdefault(type_name, {})[f'Bench{i}'] = f'{package}.plugins:Bench{i}'
+        _write_distribution(site, package, groups)
+
+    return f'Bench{count - 1}', PLUGIN_TYPES[(count - 1) % len(PLUGIN_TYPES)]
+
+
+def _write_distribution(site, name, groups):
+    dist_info = os.path.join(site, f'{name}-1.0.dist-info')
+    os.makedirs(dist_info)
+    with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as f:
+        for type_name, entrypoints in groups.items():
+            f.write(f'[xicam.plugins.{type_name}]\n')
+            f.writelines(f'{name} = {target}\n' for name, target in entrypoints.items())
+
+
+def _run(script, site, config) -> dict:
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen',
+               PYTHONPATH=os.pathsep.join(filter(None, [site, os.environ.get('PYTHONPATH')])))
+    output = subprocess.check_output([sys.executable, '-c', script, json.dumps(config)], env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def run_benchmark(workdir, count, load_workers=4) -> dict:
+    """ Collect `count` synthetic plugins in a fresh, offscreen interpreter; returns the measurements."""
+    site = os.path.join(workdir, 'site')
+    lookup = make_site(site, count)
+    config = {'site': site,
+              'cache_path': os.path.join(workdir, 'entrypoints.json'),
+              'load_workers': load_workers,
+              'lookup': lookup,
+              'edit': os.path.join(site, 'bench_plugins0', 'plugins.py')}
+    result = _run(BENCHMARK, site, config)
+    result['entrypoints'] = count
+    return result
+
+
+def time_to_perspective(workdir, count, prioritized) -> float:
+    """
+    Collect `count` synthetic plugins in a fresh, offscreen interpreter; returns the seconds until the last discovered
+    GUIPlugin (standing in for the default perspective) is instantiated. If `prioritized`, it's given a priority in the
+    manager's `plugin_priorities`.
+    """
+    site = os.path.join(workdir, 'site')
+    make_site(site, count)
+    perspective = 'Bench{}'.format(max(i for i in range(count) if PLUGIN_TYPES[i % len(PLUGIN_TYPES)] == 'GUIPlugin'))
+    config = {'site': site,
+              'cache_path': os.path.join(workdir, 'entrypoints.json'),
+              'perspective': perspective,
+              'plugin_priorities': {perspective: 10} if prioritized else {}}
+    return _run(PERSPECTIVE, site, config)['time_to_perspective']
+
+
+def format_results(results) -> str:
+    columns = ['entrypoints'] + TIMINGS + ['event_loop_hops', 'peak_memory']
+    lines = [' '.join(f'{column:>15}' for column in columns)]
+    for result in results:
+        cells = [f"{result['entrypoints']:>15}"]
+        cells += [f'{result[timing] * 1000:>12.1f} ms' for timing in TIMINGS]
+        cells.append(f"{result['event_loop_hops']:>15}")
+        memory = result['peak_memory']
+        cells.append(f'{memory / 2 ** 20:>12.1f} MB' if memory is not None else f"{'-':>15}")
+        lines.append(' '.join(cells))
+    return '\n'.join(lines)
+
+
+def benchmark_sizes():
+    sizes = os.environ.get('XICAM_BENCHMARK_SIZES')
+    return [int(size) for size in sizes.split(',')] if sizes else list(DEFAULT_SIZES)
+
+
+def check_counts(result):
+    # Every plugin is imported and collected
+    assert result['collected'] == result['imported'] == result['entrypoints']
+    # Reloading after an edit only replaces the edited distribution's plugins
+    assert result['reloaded'] == min(PLUGINS_PER_DISTRIBUTION, result['entrypoints'])
+    # The pump instantiates several plugins per event loop turn
+    assert 0 < result['event_loop_hops'] <= result['entrypoints']
+
+
+def test_collection_counts(tmpdir):
+    pytest.importorskip('qtpy.QtWidgets')
+    pytest.importorskip('xicam.core.threads')
+    for count in COUNT_SIZES:
+        check_counts(run_benchmark(str(tmpdir.mkdir(f'n{count}')), count))
+
+
+@benchmark
+def test_collection_scaling(tmpdir):
+    sizes = sorted(benchmark_sizes())
+    results = [run_benchmark(str(tmpdir.mkdir(f'n{count}')), count) for count in sizes]
+
+    for result in results:
+        check_counts(result)
+
+    # Each entrypoint should cost about the same, however many there are
+    smallest = results[0]
+    for result in results[1:]:
+        scale = result['entrypoints'] / smallest['entrypoints']
+        for timing in TIMINGS:
+            budget = smallest[timing] * scale * SCALING_TOLERANCE + SCALING_SLACK
+            assert result[timing] <= budget, \
+                f"{timing} took {result[timing]:.3f} s for {result['entrypoints']} entrypoints " \
+                f"(budget {budget:.3f} s, from {smallest[timing]:.3f} s for {smallest['entrypoints']})"
+
+
+@benchmark
+def test_time_to_default_perspective(tmpdir):
+    count = max(benchmark_sizes())
+    without_priorities = time_to_perspective(str(tmpdir.mkdir('without')), count, prioritized=False)
+    with_priorities = time_to_perspective(str(tmpdir.mkdir('with')), count, prioritized=True)
+
+    # Prioritized, the perspective is loaded and instantiated ahead of the other plugins
+    assert with_priorities < without_priorities, \
+        f'{with_priorities:.3f} s to the default perspective with priorities, {without_priorities:.3f} s without'
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    sizes = [int(size) for size in sys.argv[1:]] or benchmark_sizes()
+    with tempfile.TemporaryDirectory() as workdir:
+        print(format_results([run_benchmark(os.path.join(workdir, str(count)), count) for count in sizes]))
+        for prioritized in (False, True):
+            elapsed = time_to_perspective(os.path.join(workdir, f'perspective{prioritized}'), max(sizes), prioritized)
+            print(f"Time to default perspective {'with' if prioritized else 'without'} priorities: "
+                  f'{elapsed * 1000:.1f} ms')
@@ -0,0 +1,67 @@
+CONCURRENT_LOADING = """
+import json, threading
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+import gate
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, load_workers=2)
+collector = threading.Thread(target=manager.collect_plugins)
+collector.start()
+
+# Both workers are held up importing P0 and P1; promote P4 (as get_plugin_by_name does) before they move on
+gate.arrived['P0'].wait(10)
+gate.arrived['P1'].wait(10)
+manager._promote('ProcessingPlugin', 'P4')
+# Free one worker at a time, so which plugin the freed worker pulls next doesn't race with the other
+gate.release['P0'].set()
+gate.arrived['P4'].wait(10)
+gate.release['P1'].set()
+collector.join()
+print(json.dumps({{'order': gate.order, 'most_in_package': gate.most_in_package,
+                  'collected': sorted(manager.type_mapping['ProcessingPlugin'])}}))
+"""
+
+
+def test_concurrent_loading(plugin_site):
+    plugin_site.write('gate.py', 'import collections, threading, time\n'
+                                 'arrived = collections.defaultdict(threading.Event)\n'
+                                 'release = {"P0": threading.Event(), "P1": threading.Event()}\n'
+                                 'lock, order, in_package, most_in_package = threading.Lock(), [], [0], 0\n'
+                                 'def imported(name, package=False):\n'
+                                 '    global most_in_package\n'
+                                 '    with lock:\n'
+                                 '        order.append(name)\n'
+                                 '        in_package[0] += package\n'
+                                 '        most_in_package = max(most_in_package, in_package[0])\n'
+                                 '    arrived[name].set()\n'
+                                 '    if name in release:\n'
+                                 '        release[name].wait(10)\n'
+                                 '    time.sleep(0.01)\n'
+                                 '    with lock:\n'
+                                 '        in_package[0] -= package\n')
+    plugins = {}
+    for i in range(6):
+        plugin_site.write(f'p{i}.py', 'import gate\n'
+                                      f'gate.imported("P{i}")\n'
+                                      'from xicam.plugins import ProcessingPlugin\n'
+                                      f'class P{i}(ProcessingPlugin):\n'
+                                      '    pass\n')
+        plugins[f'P{i}'] = f'p{i}:P{i}'
+    plugin_site.write('shared_pkg/__init__.py')
+    for i in range(4):
+        plugin_site.write(f'shared_pkg/m{i}.py', 'import gate\n'
+                                                 f'gate.imported("S{i}", package=True)\n'
+                                                 'from xicam.plugins import ProcessingPlugin\n'
+                                                 f'class S{i}(ProcessingPlugin):\n'
+                                                 '    pass\n')
+        plugins[f'S{i}'] = f'shared_pkg.m{i}:S{i}'
+    plugin_site.distribution('concurrent', types=plugin_site.PROCESSING_TYPE, plugins={'ProcessingPlugin': plugins})
+    result = plugin_site.run(CONCURRENT_LOADING)
+
+    # Workers pull from the load queue as they free up, so the promotion takes effect at once
+    assert sorted(result['order'][:2]) == ['P0', 'P1']
+    assert result['order'][2] == 'P4'
+    assert all(result['order'].index('P4') < result['order'].index(name) for name in ('P2', 'P3', 'P5', 'S0'))
+    # ...but never import two modules of one package at the same time
+    assert result['most_in_package'] == 1
+    assert result['collected'] == sorted([f'P{i}' for i in range(6)] + [f'S{i}' for i in range(4)])
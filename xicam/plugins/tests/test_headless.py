@@ -0,0 +1,114 @@
+import pytest
+
+QT_MODULES = ['qtpy', 'PyQt5', 'PySide2', 'pyqtgraph', 'xicam.core.threads']
+# Only imported by plugin types that a ProcessingPlugin-only process doesn't need
+HEAVY_MODULES = ['astropy', 'intake', 'xicam.plugins.fittablemodelplugin', 'xicam.plugins.catalogplugin']
+
+HEADLESS_COLLECTION = """
+import json, sys
+from xicam.plugins import XicamPluginManager, EntrypointIndex, State, Filters
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, load_workers={load_workers})
+batched, single = [], []
+manager.attach(lambda changes: batched.append(changes.added), Filters.UPDATE, with_changes=True)
+manager.attach(lambda changes: single.append(changes.added), Filters.UPDATE, with_changes=True, coalesce=False)
+manager.collect_plugins()
+print(json.dumps({{'headless': manager.headless,
+                  'ready': manager.state == State.READY,
+                  'types': sorted(manager.plugin_types.loaded_types()),
+                  'plugins': sorted(manager.type_mapping['ProcessingPlugin']),
+                  'batched': [{{type_name: sorted(names) for type_name, names in added.items()}} for added in batched],
+                  'single': len(single),
+                  'qt': [name for name in {qt_modules!r} if name in sys.modules],
+                  'heavy': [name for name in {heavy_modules!r} if name in sys.modules]}}))
+"""
+
+
+def test_headless_collection(plugin_site, tmpdir):
+    plugin_site.write('headless_plugins.py', 'from xicam.plugins import ProcessingPlugin, Input, Output\n'
+                                             'class Increment(ProcessingPlugin):\n'
+                                             '    a = Input(default=1)\n'
+                                             '    b = Output()\n'
+                                             '    def evaluate(self):\n'
+                                             '        self.b.value = self.a.value + 1\n'
+                                             'class Decrement(Increment):\n'
+                                             '    def evaluate(self):\n'
+                                             '        self.b.value = self.a.value - 1\n')
+    plugin_site.write('qt_type.py', 'import qtpy\n'
+                                    'from xicam.plugins.plugin import PluginType\n'
+                                    'class QtType(PluginType):\n'
+                                    '    needs_qt = False\n')
+    plugin_site.distribution('headless_plugins',
+                             types={**plugin_site.PROCESSING_TYPE,
+                                    'GUIPlugin': 'xicam.plugins.guiplugin:GUIPlugin',
+                                    'Fittable1DModelPlugin': 'xicam.plugins.fittablemodelplugin:Fittable1DModelPlugin',
+                                    'CatalogPlugin': 'xicam.plugins.catalogplugin:CatalogPlugin',
+                                    'QtType': 'qt_type:QtType'},
+                             plugins={'ProcessingPlugin': {'Increment': 'headless_plugins:Increment',
+                                                           'Decrement': 'headless_plugins:Decrement'}})
+
+    for load_workers in (1, 4):
+        result = plugin_site.run(HEADLESS_COLLECTION, cache_path=str(tmpdir.join(f'cache{load_workers}.json')),
+                                 load_workers=load_workers, qt_modules=QT_MODULES, heavy_modules=HEAVY_MODULES)
+
+        # Collection completes synchronously, without touching Qt; only types that have plugins are imported
+        assert result == {'headless': True,
+                          'ready': True,
+                          'types': ['ProcessingPlugin'],
+                          'plugins': ['Decrement', 'Increment'],
+                          # Coalescing observers get one UPDATE for the whole (fast) collection
+                          'batched': [{'ProcessingPlugin': ['Decrement', 'Increment']}],
+                          'single': 2,
+                          'qt': [],
+                          'heavy': []}
+
+
+HEADLESS_DEFAULT = """
+import json, os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[])
+before = XicamPluginManager(index=index).headless
+from qtpy.QtWidgets import QApplication
+without_app = XicamPluginManager(index=index).headless
+app = QApplication([])
+with_app = XicamPluginManager(index=index).headless
+print(json.dumps([before, without_app, with_app]))
+"""
+
+
+def test_headless_default(plugin_site):
+    pytest.importorskip('qtpy.QtWidgets')
+
+    # Whether a QApplication is running is checked when each manager is created, not when xicam.plugins is imported
+    assert plugin_site.run(HEADLESS_DEFAULT) == [True, True, False]
+
+
+VENV_OBSERVERS = """
+import json, os, sys
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+without_app = XicamPluginManager(index=index)
+imported = 'xicam.gui.cammart' in sys.modules
+from qtpy.QtWidgets import QApplication
+app = QApplication([])
+with_app = XicamPluginManager(index=index)
+from xicam.gui.cammart.venvs import observers
+print(json.dumps({{'imported_without_app': imported, 'observers': [observer is with_app for observer in observers]}}))
+"""
+
+
+def test_venv_observers(plugin_site):
+    pytest.importorskip('qtpy.QtWidgets')
+    # xicam stays a namespace package, so the site's xicam.gui joins the installed xicam
+    plugin_site.write('xicam/gui/__init__.py')
+    plugin_site.write('xicam/gui/cammart/__init__.py')
+    plugin_site.write('xicam/gui/cammart/venvs.py', 'observers = []\n')
+    plugin_site.distribution('cammart', plugins={'SettingsPlugin': {'cammart': 'xicam.gui.cammart:CammartSettings'}})
+
+    # cammart is only imported, and observed, by managers created once a QApplication is running
+    assert plugin_site.run(VENV_OBSERVERS) == {'imported_without_app': False, 'observers': [True]}
@@ -0,0 +1,54 @@
+INCREMENTAL_RELOAD = """
+import json, os, sys, time
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index)
+manager.collect_plugins()
+first = dict(manager.type_mapping['ProcessingPlugin'])
+
+# Edit a helper module, and remove a module nothing but its package imports
+time.sleep(0.01)
+with open({helper!r}, 'w') as f:
+    f.write('OFFSET = 2\\n')
+os.remove({scratch!r})
+changes = manager.hot_reload(incremental=True)
+plugins = manager.type_mapping['ProcessingPlugin']
+result = {{'replaced': sorted(changes.replaced.get('ProcessingPlugin', [])),
+          'offset': plugins['Changed'].offset,
+          'sibling_unchanged': plugins['Sibling'] is first['Sibling'],
+          'scratch_unloaded': 'reload_pkg.scratch' not in sys.modules}}
+
+# Touching the (now hashed) helper without changing it isn't a change
+time.sleep(0.01)
+os.utime({helper!r})
+result['touched'] = sorted(manager.hot_reload(incremental=True).replaced.get('ProcessingPlugin', []))
+print(json.dumps(result))
+"""
+
+
+def test_incremental_reload(plugin_site):
+    plugin_site.write('reload_pkg/__init__.py', 'try:\n'
+                                                '    from . import scratch\n'
+                                                'except ImportError:\n'
+                                                '    pass\n')
+    scratch = plugin_site.write('reload_pkg/scratch.py', 'VALUE = 1\n')
+    helper = plugin_site.write('reload_pkg/helper.py', 'OFFSET = 1\n')
+    plugin_site.write('reload_pkg/plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                               'from reload_pkg import helper\n'
+                                               'class Changed(ProcessingPlugin):\n'
+                                               '    offset = helper.OFFSET\n')
+    plugin_site.write('reload_pkg/sibling.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                               'class Sibling(ProcessingPlugin):\n'
+                                               '    pass\n')
+    plugin_site.distribution('reload_pkg', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {'Changed': 'reload_pkg.plugins:Changed',
+                                                           'Sibling': 'reload_pkg.sibling:Sibling'}})
+    result = plugin_site.run(INCREMENTAL_RELOAD, env={'PYTHONDONTWRITEBYTECODE': '1'}, helper=helper, scratch=scratch)
+
+    # Only the plugin depending on the edited helper is replaced; the removed module is dropped
+    assert result == {'replaced': ['Changed'],
+                      'offset': 2,
+                      'sibling_unchanged': True,
+                      'scratch_unloaded': True,
+                      'touched': []}
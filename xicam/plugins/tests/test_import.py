@@ -0,0 +1,97 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Importing the processing API must not pull in any of these
+HEAVY_MODULES = ['distributed', 'astropy', 'databroker', 'intake', 'qtpy', 'pyqtgraph', 'yapsy',
+                 'xicam.core.threads', 'xicam.plugins.pluginmanager']
+
+# Generous upper bound (seconds) for the minimal import in a fresh interpreter; typically well under 0.5 s
+MINIMAL_IMPORT_BUDGET = 2.0
+
+MINIMAL_IMPORT = f"""
+import json, sys, time
+start = time.perf_counter()
+from xicam.plugins import ProcessingPlugin, Input, Output
+elapsed = time.perf_counter() - start
+
+# Defining and running a plugin must not pull them in either
+class Increment(ProcessingPlugin):
+    a = Input(default=1)
+    b = Output()
+
+    def evaluate(self):
+        self.b.value = self.a.value + 1
+
+assert Increment().asfunction(a=2)['b'].value == 3
+print(json.dumps({{'elapsed': elapsed, 'heavy': [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))
+"""
+
+
+def test_minimal_import():
+    output = subprocess.check_output([sys.executable, '-c', MINIMAL_IMPORT])
+    result = json.loads(output.decode().strip().splitlines()[-1])
+
+    assert result['heavy'] == []
+    assert result['elapsed'] < MINIMAL_IMPORT_BUDGET
+
+
+VERSION_LOOKUP = """
+import subprocess, sys
+import xicam.plugins
+assert '__version__' not in vars(xicam.plugins)
+
+def no_subprocesses(*args, **kwargs):
+    raise AssertionError('__version__ should be read from the installed metadata, not git')
+subprocess.Popen = no_subprocesses
+
+print(xicam.plugins.__version__)
+"""
+
+
+def test_version_from_metadata():
+    # Assumes xicam.plugins is installed (possibly in development mode), as it is for testing
+    output = subprocess.check_output([sys.executable, '-c', VERSION_LOOKUP])
+    assert output.decode().strip()
+
+
+PUBLIC_NAMES = f"""
+import json, sys
+import xicam.plugins
+public = list(xicam.plugins.__all__)
+print(json.dumps({{'heavy': [name for name in {HEAVY_MODULES!r} if name in sys.modules], 'public': public}}))
+"""
+
+STAR_IMPORT = """
+import json
+namespace = {}
+exec('from xicam.plugins import *', namespace)
+print(json.dumps({'names': sorted(name for name in namespace if not name.startswith('__')),
+                  'manager': type(namespace['manager']).__name__}))
+"""
+
+
+def _run(script):
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def test_public_names():
+    result = _run(PUBLIC_NAMES)
+
+    # Listing the public names doesn't resolve (or import) any of them
+    assert result['heavy'] == []
+    assert {'ProcessingPlugin', 'GUIPlugin', 'XicamPluginManager', 'manager', 'qt_is_safe'} <= set(result['public'])
+    assert '_EZPlugin' not in result['public']
+
+
+def test_star_import():
+    # Star-importing resolves every public name, so every plugin type's dependencies must be importable
+    pytest.importorskip('xicam.core.data')
+    public = _run(PUBLIC_NAMES)['public']
+    result = _run(STAR_IMPORT)
+
+    assert result['names'] == sorted(public)
+    assert result['manager'] == 'XicamPluginManager'
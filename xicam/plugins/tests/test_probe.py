@@ -0,0 +1,37 @@
+def test_probe_entrypoint(tmpdir, monkeypatch):
+    import entrypoints
+    from xicam.plugins.probe import probe_entrypoint
+
+    package = tmpdir.mkdir('probed_plugins')
+    package.join('__init__.py').write('')
+    package.join('helpers.py').write('SCALE = 2\n')
+    package.join('good.py').write('from . import helpers\n'
+                                  'print("plugins may print while importing")\n'
+                                  'class Good(object):\n'
+                                  '    pass\n')
+    package.join('hangs.py').write('import time\ntime.sleep(60)\n')
+    package.join('crashes.py').write('import os\nos.abort()\n')
+    package.join('raises.py').write('from . import helpers\nraise RuntimeError("missing calibration")\n')
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    def probe(module_name, object_name, timeout=10):
+        return probe_entrypoint(entrypoints.EntryPoint(object_name, f'probed_plugins.{module_name}', object_name),
+                                timeout=timeout)
+
+    result = probe('good', 'Good')
+    assert result.ok
+    assert result.sources[0] == str(package.join('good.py'))
+    assert str(package.join('helpers.py')) in result.sources
+
+    result = probe('good', 'Missing')
+    assert not result.ok and 'Missing' in result.error
+
+    result = probe('raises', 'Raises')
+    assert 'missing calibration' in result.error
+    assert str(package.join('raises.py')) in result.sources
+
+    result = probe('crashes', 'Crashes')
+    assert not result.ok and 'probed_plugins.crashes' in result.error
+
+    result = probe('hangs', 'Hangs', timeout=1)
+    assert 'timed out' in result.error
@@ -0,0 +1,269 @@
+"""
+Benchmarks for building and running ProcessingPlugins.
+
+Timings depend on the machine and what else it's running, so the tests only check them when XICAM_BENCHMARKS is set
+(i.e. ``XICAM_BENCHMARKS=1 pytest``). Run this module directly for the full-size numbers (i.e. 4k x 4k detector frames,
+100,000-node workflows, and 100,000-frame scans), and memory use per plugin instance::
+
+    python -m xicam.plugins.tests.test_processing_benchmarks
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+BENCHMARKS = bool(os.environ.get('XICAM_BENCHMARKS'))
+benchmark = pytest.mark.skipif(not BENCHMARKS, reason='timing benchmark; set XICAM_BENCHMARKS=1 to run')
+
+
+def _scale(self):
+    self.scaled.value = self.image.value
+
+
+def _threshold(self):
+    self.masked.value = self.image.value
+
+
+def _mask_normalize(self):
+    masked = np.where(self.mask.value, 0, self.frame.value)
+    self.total.value = masked.sum()
+    self.normalized.value = masked / self.total.value
+
+
+def _mask_normalize_batch(self):
+    masked = np.where(self.mask.value, 0, self.frame.value)
+    self.total.value = masked.sum(axis=(1, 2))
+    self.normalized.value = masked / self.total.value[:, None, None]
+
+
+# Representative plugins, by name: (base plugin, {variable: (Input/Output/InputOutput, keyword arguments)}, methods)
+PLUGINS = {
+    'Scale': (None, {'image': ('Input', dict(description='Detector frame', type=np.ndarray)),
+                     'factor': ('Input', dict(description='Scale factor', default=2.0, type=float)),
+                     'scaled': ('Output', dict(description='Scaled frame', type=np.ndarray))},
+              {'evaluate': _scale}),
+    # Inherits variables, like the nodes of a parameter sweep
+    'Correction': (None, {'image': ('Input', dict(description='Detector frame', type=np.ndarray)),
+                          'mask': ('InputOutput', dict(description='Mask', type=np.ndarray))}, {}),
+    'Threshold': ('Correction',
+                  {'minimum': ('Input', dict(description='Minimum', default=0.0, type=float, units='counts',
+                                             limits=(0, 1e6))),
+                   'maximum': ('Input', dict(description='Maximum', default=1e6, type=float, units='counts')),
+                   'invert': ('Input', dict(description='Invert', default=False, type=bool)),
+                   'masked': ('Output', dict(description='Masked frame', type=np.ndarray))},
+                  {'evaluate': _threshold}),
+    # Many parameters, like a peak fit
+    'PeakFit': (None, {'q': ('Input', dict(description='Scattering vector', type=np.ndarray, units='1/nm')),
+                       'intensity': ('Input', dict(description='Intensity', type=np.ndarray, units='counts')),
+                       'fit': ('Output', dict(description='Fitted curve', type=np.ndarray)),
+                       'residual': ('Output', dict(description='Fit residual', type=float)),
+                       **{name: variable for i in range(8) for name, variable in [
+                           (f'center{i}', ('Input', dict(description=f'Center of peak {i}', default=1.0, type=float,
+                                                         units='1/nm', limits=(0, 10), fixable=True))),
+                           (f'width{i}', ('Input', dict(description=f'Width of peak {i}', default=0.1, type=float,
+                                                        units='1/nm', min=0)))]}},
+                {}),
+    # Masks and normalizes frame by frame, and its vectorised counterpart
+    'MaskNormalize': (None, {'frame': ('Input', dict(description='Detector frame', type=np.ndarray)),
+                             'mask': ('Input', dict(description='Mask (True where masked)', type=np.ndarray)),
+                             'normalized': ('Output', dict(description='Masked frame, normalized to its total',
+                                                           type=np.ndarray)),
+                             'total': ('Output', dict(description='Unmasked total', type=float))},
+                      {'evaluate': _mask_normalize}),
+    'BatchMaskNormalize': ('MaskNormalize', {}, {'evaluate_batch': _mask_normalize_batch}),
+}
+
+# The plugins whose instantiation and memory use are measured
+INSTANCE_PLUGINS = ['Scale', 'Threshold', 'PeakFit']
+
+
+def make_plugin(name):
+    """ Define the plugin class `name` (see PLUGINS), and its base plugins."""
+    from xicam.plugins import processingplugin
+
+    base_name, variables, methods = PLUGINS[name]
+    base = make_plugin(base_name) if base_name else processingplugin.ProcessingPlugin
+    attrs = {var_name: getattr(processingplugin, kind)(**kwargs) for var_name, (kind, kwargs) in variables.items()}
+    return type(name, (base,), {**attrs, **methods})
+
+
+@pytest.fixture(params=INSTANCE_PLUGINS)
+def plugin(request):
+    return make_plugin(request.param)
+
+
+def time_instantiation(plugin, count) -> float:
+    """ Seconds to build the `count` nodes of a parameter sweep over instances of `plugin`."""
+    plugin()
+    start = time.perf_counter()
+    for minimum in range(count):
+        node = plugin()
+        node.minimum.value = minimum
+    return time.perf_counter() - start
+
+
+def bytes_per_instance(plugin, count=1000) -> float:
+    """ Memory held by each instance of `plugin` (including its variables), averaged over `count` instances."""
+    plugin()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        instances = [plugin() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before - sys.getsizeof(instances)) / count
+
+
+def benchmark_memory(count=1000) -> dict:
+    """ Bytes per instance of representative plugins, by plugin name."""
+    plugins = [make_plugin(name) for name in INSTANCE_PLUGINS]
+    return {f'{plugin.__name__} ({len(plugin._var_schema)} variables)': bytes_per_instance(plugin, count)
+            for plugin in plugins}
+
+
+def format_memory(results) -> str:
+    return '\n'.join(['Memory per plugin instance:'] +
+                     [f'    {name:>26}: {size:8.0f} bytes' for name, size in results.items()])
+
+
+def benchmark_scan(count, size=16) -> dict:
+    """ Seconds to mask and normalize a scan of `count` frames: frame by frame, and batched (generic and vectorised)."""
+    plugin, batch_plugin = make_plugin('MaskNormalize'), make_plugin('BatchMaskNormalize')
+    scan = np.random.default_rng(0).random((count, size, size)) + 1
+    mask = np.zeros((size, size), dtype=bool)
+    mask[:, :2] = True
+
+    def frame_by_frame():
+        node = plugin()
+        node.mask.value = mask
+        return np.stack([node.asfunction(frame=frame)['normalized'].value for frame in scan])
+
+    def batched(plugin):
+        node = plugin()
+        node.mask.value = mask
+        return node.asfunction_batch(frame=scan)['normalized'].value
+
+    results = {}
+    for name, run in [('asfunction per frame', frame_by_frame),
+                      ('asfunction_batch', lambda: batched(plugin)),
+                      ('vectorised', lambda: batched(batch_plugin))]:
+        start = time.perf_counter()
+        normalized = run()
+        results[name] = time.perf_counter() - start
+        assert np.allclose(normalized[:, :, :2], 0) and np.allclose(normalized.sum(axis=(1, 2)), 1)
+    return results
+
+
+def format_scan(count, results) -> str:
+    return '\n'.join([f'Masking and normalizing {count} frames:'] +
+                     [f'    {name:>20}: {elapsed * 1000:8.1f} ms' for name, elapsed in results.items()])
+
+
+def frames(size):
+    """ Large frames as they reach plugins: contiguous, and as strided and transposed views of a larger buffer."""
+    buffer = np.ones((size, 2 * size), dtype=np.float32)
+    return {'contiguous': np.ones((size, size), dtype=np.float32),
+            'strided view': buffer[:, ::2],
+            'transposed view': buffer[:, :size].T}
+
+
+def time_asfunction(plugin, frame, serialize=None, repeat=3) -> float:
+    """ Seconds per `asfunction` call feeding `frame` to `plugin`, after `serialize(frame)` if given."""
+    def call():
+        if serialize is not None:
+            serialize(frame)
+        plugin.asfunction(image=frame, factor=3.0)
+
+    call()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - start) / repeat
+
+
+def benchmark_asfunction(size):
+    """
+    Time `asfunction` with large ndarray inputs, before (with the serialization that `Input` used to do on every
+    value assignment) and after; returns {frame kind: (before, after) seconds per call}.
+    """
+    from distributed.protocol.serialize import serialize
+
+    plugin = make_plugin('Scale')()
+    return {kind: (time_asfunction(plugin, frame, serialize), time_asfunction(plugin, frame))
+            for kind, frame in frames(size).items()}
+
+
+def format_asfunction(size, results) -> str:
+    lines = [f'asfunction with {size}x{size} float32 frames (before / after):']
+    for kind, (before, after) in results.items():
+        lines.append(f'    {kind:>16}: {before * 1000:8.2f} ms / {after * 1000:8.3f} ms')
+    return '\n'.join(lines)
+
+
+@benchmark
+def test_asfunction_large_frames():
+    results = benchmark_asfunction(2048)
+
+    # Feeding a frame to a plugin no longer serializes it
+    for kind, (before, after) in results.items():
+        assert after < 0.005, f'asfunction took {after * 1000:.1f} ms with a {kind} frame'
+    before, after = results['transposed view']
+    assert after * 10 < before
+
+
+def test_instantiate_sweep(monkeypatch):
+    plugin = make_plugin('Threshold')
+    assert [name for name, *_ in plugin._var_schema] == ['image', 'mask', 'minimum', 'maximum', 'invert', 'masked']
+
+    # Nodes are built from the compiled variables, without inspecting the class again; each gets its own variables
+    def compile_vars():
+        raise AssertionError('variables must be compiled once per class')
+
+    monkeypatch.setattr(plugin, '_compile_vars', compile_vars)
+    nodes = [plugin() for _ in range(3)]
+    for minimum, node in enumerate(nodes):
+        node.minimum.value = minimum
+    assert [node.minimum.value for node in nodes] == [0, 1, 2]
+    assert nodes[0].minimum is not nodes[1].minimum and nodes[0].minimum.parent is nodes[0]
+    assert list(nodes[0].inputs) == ['image', 'mask', 'minimum', 'maximum', 'invert']
+
+
+@benchmark
+def test_instantiate_sweep_timing():
+    plugin = make_plugin('Threshold')
+    small, large = time_instantiation(plugin, 1000), time_instantiation(plugin, 10000)
+
+    # Instantiating is bound by copying the variables, not by inspecting the class
+    assert large / 10000 < 20e-6 * len(plugin._var_schema)
+    assert large < small * 10 * 4 + 0.05
+
+
+def test_memory_per_instance(plugin):
+    # Variables' metadata is shared between instances; each instance only holds its variables' values and connections
+    assert bytes_per_instance(plugin) < 600 + 300 * len(plugin._var_schema)
+
+
+def test_scan_batch():
+    # Every way of running the scan masks and normalizes each frame (see benchmark_scan)
+    assert set(benchmark_scan(100)) == {'asfunction per frame', 'asfunction_batch', 'vectorised'}
+
+
+@benchmark
+def test_scan_batch_timing():
+    results = benchmark_scan(10000)
+
+    # The generic batch is no slower than calling asfunction per frame; vectorised plugins run at NumPy speed
+    assert results['asfunction_batch'] < results['asfunction per frame'] * 1.5
+    assert results['vectorised'] * 3 < results['asfunction per frame']
+
+
+if __name__ == '__main__':
+    print(format_asfunction(4096, benchmark_asfunction(4096)))
+    elapsed = time_instantiation(make_plugin('Threshold'), 100000)
+    print(f'100,000 nodes: {elapsed:.2f} s ({elapsed / 100000 * 1e6:.1f} us per node)')
+    print(format_memory(benchmark_memory()))
+    print(format_scan(100000, benchmark_scan(100000)))
@@ -0,0 +1,115 @@
+RECOLLECTION = """
+import json, os
+from xicam.plugins import XicamPluginManager, EntrypointIndex, Filters
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index)
+manager.collect_plugins()
+first = manager.type_mapping['ProcessingPlugin']['Increment']
+
+# Install a package with a new plugin, uninstall one, and repoint another
+with open({entry_points!r}, 'w') as f:
+    f.write('[xicam.plugins.ProcessingPlugin]\\nIncrement = headless_plugins:Increment\\n'
+            'Decrement = more_plugins:Decrement\\n')
+os.makedirs(os.path.join({site!r}, 'more_plugins-1.0.dist-info'))
+with open(os.path.join({site!r}, 'more_plugins-1.0.dist-info', 'entry_points.txt'), 'w') as f:
+    f.write('[xicam.plugins.ProcessingPlugin]\\nSquare = more_plugins:Square\\n')
+
+changes = []
+manager.attach(lambda c: changes.append(c), Filters.UPDATE, with_changes=True, coalesce=False)
+manager.venvChanged()
+plugins = manager.type_mapping['ProcessingPlugin']
+print(json.dumps({{'plugins': {{name: plugin.__module__ for name, plugin in sorted(plugins.items())}},
+                  'unchanged': plugins['Increment'] is first,
+                  'added': sorted(name for c in changes for name in c.added.get('ProcessingPlugin', [])),
+                  'removed': sorted(name for c in changes for name in c.removed.get('ProcessingPlugin', []))}}))
+"""
+
+
+def test_recollection(plugin_site):
+    plugin_site.write('headless_plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                             'class Increment(ProcessingPlugin):\n'
+                                             '    pass\n'
+                                             'class Decrement(ProcessingPlugin):\n'
+                                             '    pass\n'
+                                             'class Negate(ProcessingPlugin):\n'
+                                             '    pass\n')
+    plugin_site.write('more_plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                         'class Decrement(ProcessingPlugin):\n'
+                                         '    pass\n'
+                                         'class Square(ProcessingPlugin):\n'
+                                         '    pass\n')
+    plugin_site.distribution('types', types=plugin_site.PROCESSING_TYPE)
+    entry_points = plugin_site.distribution('headless_plugins',
+                                            plugins={'ProcessingPlugin': {'Increment': 'headless_plugins:Increment',
+                                                                          'Decrement': 'headless_plugins:Decrement',
+                                                                          'Negate': 'headless_plugins:Negate'}})
+
+    # Only new and changed entrypoints are loaded; removed ones are retired
+    assert plugin_site.run(RECOLLECTION, entry_points=entry_points) == {
+        'plugins': {'Decrement': 'more_plugins', 'Increment': 'headless_plugins', 'Square': 'more_plugins'},
+        'unchanged': True,
+        'added': ['Decrement', 'Square'],
+        'removed': ['Decrement', 'Negate']}
+
+
+CHANGED_DURING_COLLECTION = """
+import json, os, threading, time
+from xicam.plugins import XicamPluginManager, EntrypointIndex, Filters
+import gate
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, plugin_priorities={{'Slow': 1}})
+removed = []
+manager.attach(lambda c: removed.extend(c.removed.get('ProcessingPlugin', [])), Filters.UPDATE, with_changes=True,
+               coalesce=False)
+
+# Collect on another thread, which is held up importing Slow; meanwhile, Uninstalled is uninstalled
+collector = threading.Thread(target=manager.collect_plugins)
+collector.start()
+gate.started.wait(10)
+with open({entry_points!r}, 'w') as f:
+    f.write('[xicam.plugins.ProcessingPlugin]\\nSlow = slow_plugins:Slow\\nKept = kept_plugins:Kept\\n'
+            'Installed = kept_plugins:Installed\\n')
+recollector = threading.Thread(target=manager.venvChanged)
+recollector.start()
+deadline = time.monotonic() + 10
+while not manager._recollect and time.monotonic() < deadline:
+    time.sleep(0.01)
+result = {{'deferred': manager._recollect and removed == []}}
+gate.release.set()
+collector.join()
+recollector.join()
+result.update(removed=removed, plugins=sorted(manager.type_mapping['ProcessingPlugin']), state=manager.state.name)
+print(json.dumps(result))
+"""
+
+
+def test_changed_during_collection(plugin_site):
+    plugin_site.write('gate.py', 'import threading\n'
+                                 'started, release = threading.Event(), threading.Event()\n')
+    plugin_site.write('slow_plugins.py', 'import gate\n'
+                                         'gate.started.set()\n'
+                                         'gate.release.wait(10)\n'
+                                         'from xicam.plugins import ProcessingPlugin\n'
+                                         'class Slow(ProcessingPlugin):\n'
+                                         '    pass\n')
+    plugin_site.write('kept_plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                         'class Kept(ProcessingPlugin):\n'
+                                         '    pass\n'
+                                         'class Uninstalled(ProcessingPlugin):\n'
+                                         '    pass\n'
+                                         'class Installed(ProcessingPlugin):\n'
+                                         '    pass\n')
+    plugin_site.distribution('types', types=plugin_site.PROCESSING_TYPE)
+    entry_points = plugin_site.distribution('changing',
+                                            plugins={'ProcessingPlugin': {'Slow': 'slow_plugins:Slow',
+                                                                          'Kept': 'kept_plugins:Kept',
+                                                                          'Uninstalled': 'kept_plugins:Uninstalled'}})
+
+    # Uninstalled plugins are only retired once the collection in progress completes, then collection resumes
+    assert plugin_site.run(CHANGED_DURING_COLLECTION, entry_points=entry_points) == {
+        'deferred': True,
+        'removed': ['Uninstalled'],
+        'plugins': ['Installed', 'Kept', 'Slow'],
+        'state': 'READY'}
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+
+
+def make_distribution(site_dir, name, entry_points):
+    dist_info = os.path.join(site_dir, f'{name}-1.0.dist-info')
+    os.makedirs(dist_info, exist_ok=True)
+    with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as f:
+        for group, entries in entry_points.items():
+            f.write(f'[{group}]\n')
+            for entry_name, target in entries.items():
+                f.write(f'{entry_name} = {target}\n')
+
+
+def test_EntrypointIndex(tmpdir):
+    import entrypoints
+    from xicam.plugins.startupcache import EntrypointIndex
+
+    site_dir = str(tmpdir.mkdir('site'))
+    make_distribution(site_dir, 'pluginA', {'xicam.plugins.ProcessingPlugin': {'Sum': 'plugina.sum:Sum'},
+                                            'console_scripts': {'plugina': 'plugina:main'}})
+    make_distribution(site_dir, 'pluginB', {'xicam.plugins.ProcessingPlugin': {'Sum': 'pluginb.sum:Sum',
+                                                                                'Mask': 'pluginb.mask:Mask'}})
+
+    cache_path = str(tmpdir.join('cache', 'entrypoints.json'))
+    index = EntrypointIndex(cache_path=cache_path, path=[site_dir])
+
+    group = 'xicam.plugins.ProcessingPlugin'
+    expected = entrypoints.get_group_all(group, path=[site_dir])
+    assert [(ep.name, ep.module_name) for ep in index.get_group_all(group)] == \
+           [(ep.name, ep.module_name) for ep in expected]
+    assert set(index.get_group_named(group)) == {'Sum', 'Mask'}
+    assert index.get_group_all('console_scripts') == []
+    assert os.path.isfile(cache_path)
+
+    # A new index with an unchanged environment is served from disk
+    cached_index = EntrypointIndex(cache_path=cache_path, path=[site_dir])
+    cached_index._build = lambda: (_ for _ in ()).throw(AssertionError('index should not be rebuilt'))
+    assert set(cached_index.get_group_named(group)) == {'Sum', 'Mask'}
+
+    # Installing a new distribution changes the fingerprint and rebuilds the index
+    time.sleep(0.01)
+    make_distribution(site_dir, 'pluginC', {'xicam.plugins.ProcessingPlugin': {'Normalize': 'pluginc:Normalize'}})
+    index.refresh()
+    assert set(index.get_group_named(group)) == {'Sum', 'Mask', 'Normalize'}
+
+
+def test_FailureCache(tmpdir, monkeypatch):
+    import entrypoints
+    from xicam.plugins.startupcache import EntrypointIndex, FailureCache
+
+    site_dir = tmpdir.mkdir('site')
+    site_dir.join('broken_plugin.py').write('import broken_helper\n')
+    site_dir.join('broken_helper.py').write('raise RuntimeError("missing calibration")\n')
+    make_distribution(str(site_dir), 'broken', {'xicam.plugins.ProcessingPlugin': {'Broken': 'broken_plugin:Broken'}})
+    monkeypatch.syspath_prepend(str(site_dir))
+
+    index = EntrypointIndex(cache_path=str(tmpdir.join('cache', 'entrypoints.json')), path=[str(site_dir)])
+    entrypoint = index.get_group_named('xicam.plugins.ProcessingPlugin')['Broken']
+    failures = FailureCache(index)
+    assert failures.check('ProcessingPlugin', entrypoint) is None
+
+    try:
+        entrypoint.load()
+    except RuntimeError as ex:
+        failures.record('ProcessingPlugin', entrypoint, ex)
+
+    # The failure persists across launches
+    failures = FailureCache(EntrypointIndex(cache_path=index.cache_path, path=[str(site_dir)]))
+    assert 'missing calibration' in failures.check('ProcessingPlugin', entrypoint)
+
+    # ...until a file involved in the failed import changes
+    time.sleep(0.01)
+    site_dir.join('broken_helper.py').write('BROKEN = False\n')
+    assert failures.check('ProcessingPlugin', entrypoint) is None
+    assert FailureCache(index).check('ProcessingPlugin', entrypoint) is None
+
+    # Retries can be forced
+    failures.record('ProcessingPlugin', entrypoint, RuntimeError('flaky'))
+    assert failures.check('ProcessingPlugin', entrypoint) == "RuntimeError('flaky')"
+    failures.forget('ProcessingPlugin')
+    assert failures.check('ProcessingPlugin', entrypoint) is None
+
+    for module in ('broken_plugin', 'broken_helper'):
+        sys.modules.pop(module, None)
+
+
+def test_ProbeCache(tmpdir):
+    from xicam.plugins.startupcache import EntrypointIndex, ProbeCache
+
+    site_dir = tmpdir.mkdir('site')
+    site_dir.join('probed_plugin.py').write('class Probed(object):\n    pass\n')
+    make_distribution(str(site_dir), 'probed', {'xicam.plugins.ProcessingPlugin': {'Probed': 'probed_plugin:Probed'}})
+
+    index = EntrypointIndex(cache_path=str(tmpdir.join('cache', 'entrypoints.json')), path=[str(site_dir)])
+    entrypoint = index.get_group_named('xicam.plugins.ProcessingPlugin')['Probed']
+    probes = ProbeCache(index)
+    assert probes.check('ProcessingPlugin', entrypoint) is None
+
+    probes.record('ProcessingPlugin', entrypoint, [], elapsed=0.25, memory=2 ** 20)
+    assert ProbeCache(index).check('ProcessingPlugin', entrypoint)['elapsed'] == 0.25
+
+    # Changing the module (found through the index, without importing it) invalidates the probe
+    time.sleep(0.01)
+    site_dir.join('probed_plugin.py').write('class Probed(object):\n    changed = True\n')
+    assert probes.check('ProcessingPlugin', entrypoint) is None
+
+
+def test_records_batch(tmpdir, monkeypatch):
+    from xicam.plugins.startupcache import EntrypointIndex, ProbeCache
+
+    site_dir = tmpdir.mkdir('site')
+    entry_points = {}
+    for i in range(50):
+        site_dir.join(f'batched_plugin{i}.py').write(f'class P{i}(object):\n    pass\n')
+        entry_points[f'P{i}'] = f'batched_plugin{i}:P{i}'
+    make_distribution(str(site_dir), 'batched', {'xicam.plugins.ProcessingPlugin': entry_points})
+
+    index = EntrypointIndex(cache_path=str(tmpdir.join('cache', 'entrypoints.json')), path=[str(site_dir)])
+    group = index.get_group_named('xicam.plugins.ProcessingPlugin')
+    probes = ProbeCache(index)
+    writes = []
+    write = probes._write
+    monkeypatch.setattr(probes, '_write', lambda: writes.append(write()))
+
+    # Records stored within a batch are saved once, when it ends
+    with probes.batch():
+        with probes.batch():
+            for entrypoint in group.values():
+                probes.record('ProcessingPlugin', entrypoint, [], elapsed=0.1)
+        assert not writes and not os.path.exists(probes.cache_path)
+    assert len(writes) == 1
+    assert all(ProbeCache(index).check('ProcessingPlugin', entrypoint) for entrypoint in group.values())
+
+    # So are stale records dropped within a batch
+    time.sleep(0.01)
+    for i in range(50):
+        site_dir.join(f'batched_plugin{i}.py').write(f'class P{i}(object):\n    changed = True\n')
+    with probes.batch():
+        assert not any(probes.check('ProcessingPlugin', entrypoint) for entrypoint in group.values())
+    assert len(writes) == 2
+    assert ProbeCache(index)._load() == {}
+
+    # Outside a batch, changes are saved as they're made
+    probes.record('ProcessingPlugin', group['P0'], [], elapsed=0.1)
+    assert len(writes) == 3
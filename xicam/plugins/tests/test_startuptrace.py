@@ -0,0 +1,71 @@
+import json
+import threading
+
+
+def test_StartupTrace(tmpdir):
+    from xicam.plugins.startuptrace import StartupTrace
+
+    trace = StartupTrace()
+    with trace.span('discover plugins', 'discovery'):
+        with trace.span('ProcessingPlugin', 'scan'):
+            pass
+
+    def import_plugin(name):
+        with trace.span(name, 'import', type_name='ProcessingPlugin'):
+            bytearray(1024)
+
+    workers = [threading.Thread(target=import_plugin, args=(f'Plugin{i}',)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    report = trace.report()
+    assert len(report.spans) == 6
+    assert len(report.by_category('import')) == 4
+    assert threading.get_ident() not in {span.thread_id for span in report.by_category('import')}
+    assert report.for_plugin('Plugin0')[0].args == {'type_name': 'ProcessingPlugin'}
+    assert len(report.slowest(2, category='import')) == 2
+    assert set(report.plugin_totals()) == {f'Plugin{i}' for i in range(4)}
+    assert report.wall_time >= report.by_category('discovery')[0].duration
+    assert 'import: 4 spans' in str(report)
+
+    for plugins in (3, 5):
+        with trace.span('instantiate tick', 'tick') as tick:
+            tick['plugins'] = plugins
+    report = trace.report()
+    assert report.plugins_per_tick == 4
+    assert report.ticks_per_second > 0
+    assert 'plugins/tick' in str(report)
+
+    path = str(tmpdir.join('trace.json'))
+    report.save_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    assert len(events) == 8
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+
+
+def test_StartupTrace_memory():
+    import tracemalloc
+    from xicam.plugins.startuptrace import StartupTrace
+
+    was_tracing = tracemalloc.is_tracing()
+    trace = StartupTrace(track_memory=True)
+    try:
+        retained = []
+        with trace.span('Heavy', 'import'):
+            retained.append(bytearray(8 * 2 ** 20))
+        with trace.span('Heavy', 'instantiate'):
+            retained.append(bytearray(2 ** 20))
+        with trace.span('Light', 'import'):
+            pass
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    memory = trace.report().plugin_memory()
+    assert list(memory) == ['Heavy', 'Light']
+    assert memory['Heavy']['traced'] >= 9 * 2 ** 20
+    assert memory['Light']['traced'] < 2 ** 20
+    assert 'largest plugins' in str(trace.report())
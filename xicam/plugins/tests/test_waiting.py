@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+WAITING = """
+import json, os, threading
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+import gate
+
+index = EntrypointIndex(cache_path={cache_path!r}, path=[{site!r}])
+manager = XicamPluginManager(index=index, plugin_priorities={{'Slow': 1, 'Slower': 1}})
+results = {{}}
+
+# Collect on another thread, which is held up importing Slow
+collector = threading.Thread(target=manager.collect_plugins)
+collector.start()
+gate.started.wait(10)
+
+try:
+    manager.get_plugin_by_name('Fast', 'ProcessingPlugin', timeout=0.1)
+except TimeoutError:
+    results['timeout'] = True
+try:
+    manager.get_plugin_by_name('Broken', 'ProcessingPlugin')
+except RuntimeError as ex:
+    results['error'] = str(ex)
+
+waiter = threading.Thread(target=lambda: results.update(waited=manager.get_plugin_by_name('Fast').__name__))
+waiter.start()
+gate.release.set()
+waiter.join()
+collector.join()
+
+# Fix Broken and install Slower, then wait on Broken while re-collecting; its old error must not be handed out
+with open(os.path.join({site!r}, 'broken_plugins.py'), 'w') as f:
+    f.write('from xicam.plugins import ProcessingPlugin\\nclass Broken(ProcessingPlugin):\\n    pass\\n')
+with open(os.path.join({site!r}, 'slower-1.0.dist-info', 'entry_points.txt'), 'w') as f:
+    f.write('[xicam.plugins.ProcessingPlugin]\\nSlower = slower_plugins:Slower\\n')
+gate.started.clear()
+gate.release.clear()
+collector = threading.Thread(target=manager.venvChanged)
+collector.start()
+gate.started.wait(10)
+threading.Timer(0.2, gate.release.set).start()
+results['recollected'] = manager.get_plugin_by_name('Broken', 'ProcessingPlugin').__name__
+collector.join()
+print(json.dumps(results))
+"""
+
+
+def test_wait_for_plugins(plugin_site):
+    plugin_site.write('gate.py', 'import threading\n'
+                                 'started, release = threading.Event(), threading.Event()\n')
+    for name in ('Slow', 'Slower'):
+        plugin_site.write(f'{name.lower()}_plugins.py', 'import gate\n'
+                                                        'gate.started.set()\n'
+                                                        'gate.release.wait(10)\n'
+                                                        'from xicam.plugins import ProcessingPlugin\n'
+                                                        f'class {name}(ProcessingPlugin):\n'
+                                                        '    pass\n')
+    plugin_site.write('fast_plugins.py', 'from xicam.plugins import ProcessingPlugin\n'
+                                         'class Fast(ProcessingPlugin):\n'
+                                         '    pass\n')
+    plugin_site.write('broken_plugins.py', 'raise RuntimeError("broken")\n')
+    plugin_site.distribution('waiting_plugins', types=plugin_site.PROCESSING_TYPE,
+                             plugins={'ProcessingPlugin': {'Slow': 'slow_plugins:Slow',
+                                                           'Fast': 'fast_plugins:Fast',
+                                                           'Broken': 'broken_plugins:Broken'}})
+    plugin_site.distribution('slower')
+
+    # Waiting callers time out, get the plugin's import error, or the plugin once it's collected
+    assert plugin_site.run(WAITING) == {'timeout': True, 'error': 'broken', 'waited': 'Fast', 'recollected': 'Broken'}
+
+
+QT_WAITING = """
+import json, os, threading
+from concurrent.futures import Future
+from qtpy.QtWidgets import QApplication
+from xicam.plugins import XicamPluginManager, EntrypointIndex
+
+app = QApplication([])
+manager = XicamPluginManager(index=EntrypointIndex(cache_path={cache_path!r}, path=[]), headless={headless})
+results = {{'headless': manager.headless}}
+
+# Resolved (or failed) from another thread while the main thread waits
+future = Future()
+threading.Timer(0.05, future.set_result, ['plugin']).start()
+results['waited'] = manager._wait_for(future, 'Waited', 5)
+future = Future()
+threading.Timer(0.05, future.set_exception, [RuntimeError('broken')]).start()
+try:
+    manager._wait_for(future, 'Broken', 5)
+except RuntimeError as ex:
+    results['error'] = str(ex)
+try:
+    manager._wait_for(Future(), 'Never', 0.1)
+except TimeoutError:
+    results['timeout'] = True
+print(json.dumps(results))
+"""
+
+
+@pytest.mark.parametrize('headless', [False, True])
+def test_wait_on_main_thread(plugin_site, headless):
+    pytest.importorskip('qtpy.QtWidgets')
+    pytest.importorskip('xicam.core.threads')
+    result = plugin_site.run(QT_WAITING, env={'QT_QPA_PLATFORM': os.environ.get('QT_QPA_PLATFORM', 'offscreen')},
+                             headless=headless)
+
+    # With Qt, the main thread waits in an event loop; headless, on the future itself
+    assert result == {'headless': headless, 'waited': 'plugin', 'error': 'broken', 'timeout': True}